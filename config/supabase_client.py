@@ -1,11 +1,23 @@
 import os
-from supabase import create_client, Client
+import asyncio
+import logging
+import threading
+import httpx
+from postgrest.exceptions import APIError
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file (only in development)
 if not os.getenv("RAILWAY_ENVIRONMENT"):
     load_dotenv()
 
+# PostgREST request timeouts in seconds: fail fast when a connection can't be opened,
+# but leave room for large bulk writes once connected
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "2"))
+SUPABASE_REQUEST_TIMEOUT = float(os.getenv("SUPABASE_REQUEST_TIMEOUT", "60"))
+
 # Simple Supabase client creation following official docs
 def get_supabase_client() -> Client:
     """Get a simple Supabase client following the official docs pattern"""
@@ -20,18 +32,121 @@ def get_supabase_client() -> Client:
             missing.append("SUPABASE_SERVICE_ROLE_KEY")
         raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
     
-    return create_client(url, key)
+    # Service-role key: there is no user session to persist or refresh in the background
+    options = ClientOptions(
+        postgrest_client_timeout=httpx.Timeout(SUPABASE_REQUEST_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+        auto_refresh_token=False,
+        persist_session=False
+    )
+    return create_client(url, key, options=options)
 
 # Create a single global client instance
 _supabase_client = None
+_supabase_client_lock = threading.Lock()
+
+# Maximum Supabase requests in flight at once from this process (stays under the pooler's limits)
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "10"))
+_request_slots = asyncio.Semaphore(SUPABASE_MAX_CONCURRENCY)
 
 def get_service_client() -> Client:
-    """Get the global Supabase service client"""
+    """
+    Get the global Supabase service client.
+
+    Created once per process and reused, so every query shares the client's
+    keep-alive connection pool. The lock makes first use safe from the worker
+    threads that execute_async runs queries in; after that the client is safe
+    to share between asyncio tasks because each query builds its own request.
+    """
     global _supabase_client
     if _supabase_client is None:
-        _supabase_client = get_supabase_client()
+        with _supabase_client_lock:
+            if _supabase_client is None:
+                _supabase_client = get_supabase_client()
     return _supabase_client
 
+def close_service_client() -> None:
+    """Close the global client's PostgREST connection pool (call on shutdown)."""
+    global _supabase_client
+    with _supabase_client_lock:
+        if _supabase_client is None:
+            return
+        try:
+            _supabase_client.postgrest.session.close()
+        except Exception as e:
+            logger.warning(f"Error closing Supabase client: {str(e)}")
+        _supabase_client = None
+
+async def execute_async(query):
+    """
+    Execute a Supabase query builder in a worker thread.
+
+    The Supabase client is synchronous; running execute() directly inside a
+    coroutine blocks the event loop and serializes concurrent tasks.
+
+    At most SUPABASE_MAX_CONCURRENCY queries run at once; the rest wait their turn.
+
+    Args:
+        query: An unexecuted query builder, e.g. client.table("x").select("id")
+
+    Returns:
+        The query's APIResponse
+    """
+    async with _request_slots:
+        return await asyncio.to_thread(query.execute)
+
+# PostgREST and Postgres error codes worth retrying: PostgREST can't reach or has lost
+# its database connection (PGRST000-003), serialization failure, deadlock,
+# too many connections, server shutting down; "08..." codes are connection exceptions
+RETRYABLE_API_ERROR_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01", "53300", "57P01")
+
+def is_retryable_api_error(error: APIError) -> bool:
+    """
+    Tell whether a postgrest APIError is a transient failure.
+
+    postgrest raises APIError for every HTTP error, not httpx.HTTPStatusError. When
+    the response body isn't PostgREST's JSON (e.g. a 429 or 503 from the gateway),
+    the error's code is the HTTP status; otherwise it is a PGRST or SQLSTATE code.
+    """
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        status = int(code)
+        return status == 429 or status >= 500
+    return code in RETRYABLE_API_ERROR_CODES or code.startswith("08")
+
+async def execute_with_retry(query, attempts: int = 4, base_delay: float = 0.25):
+    """
+    Execute a Supabase query builder off the event loop, retrying transient failures.
+
+    Connection errors, 429 and 5xx responses (and PostgREST's connection-level
+    errors, see is_retryable_api_error) are retried with exponential backoff
+    (base_delay * 2**attempt seconds); any other error is raised immediately.
+    Only use this for idempotent writes (upserts, updates keyed on a filter).
+
+    Args:
+        query: An unexecuted query builder, e.g. client.table("x").update({...}).eq(...)
+        attempts: Total number of attempts before giving up
+        base_delay: Delay in seconds before the first retry
+
+    Returns:
+        The query's APIResponse
+    """
+    for attempt in range(attempts):
+        try:
+            async with _request_slots:
+                return await asyncio.to_thread(query.execute)
+        except (httpx.TransportError, httpx.HTTPStatusError, APIError) as e:
+            if isinstance(e, APIError):
+                retryable = is_retryable_api_error(e)
+            else:
+                response = getattr(e, "response", None)
+                retryable = response is None or response.status_code == 429 or response.status_code >= 500
+            if not retryable or attempt == attempts - 1:
+                raise
+            delay = base_delay * 2 ** attempt
+            logger.warning(f"Transient Supabase error ({str(e)}), retrying in {delay:.2f}s "
+                           f"(attempt {attempt + 1}/{attempts})")
+            await asyncio.sleep(delay)
+
 def get_anon_client() -> Client:
     """Get anonymous client (for now, just return the service client)"""
     return get_service_client()
@@ -70,6 +70,15 @@ async def startup_event():
     
     logger.info("Underground API startup complete")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources on shutdown."""
+    from utils.http_client import close_http_client
+    from config.supabase_client import close_service_client
+    await close_http_client()
+    close_service_client()
+    logger.info("Shared HTTP and Supabase clients closed")
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -4,9 +4,18 @@ These routes are protected by CRON_SECRET and trigger background jobs.
 
 Note: sync_existing_tickets_bluestakes_data has been consolidated into
 sync_bluestakes_tickets for better efficiency.
+
+Scheduling lives outside this process: the endpoints are called by an external
+cron, so a restart or redeploy never loses the schedule itself. A tick that
+arrives while the API is down, or that queue_exclusive_job refuses with a 409
+because the same job with the same arguments is still running, is not retried:
+- The ticket sync catches up on its next run, because it always looks back
+  days_back days (28 by default) rather than only since the last run.
+- The weekly project digest does not catch up: a missed or refused tick means
+  no digest until the following week.
 """
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Header, Query
-from typing import Optional
+from typing import Optional, Set, Tuple
 import os
 import logging
 from datetime import datetime
@@ -16,6 +25,46 @@ logger = logging.getLogger(__name__)
 
 cron_router = APIRouter(prefix="/cron", tags=["cron"])
 
+# Jobs queued or running in this process, keyed by job name and arguments; the same
+# job never runs twice at once with the same arguments
+_running_jobs: Set[Tuple] = set()
+
+
+def queue_exclusive_job(background_tasks: BackgroundTasks, job_name: str, job, *args) -> None:
+    """
+    Queue a background job unless the same job with the same arguments is already queued or running.
+
+    Overlapping triggers (a slow run, a retried cron call) are refused with a 409
+    instead of stacking up duplicate runs. Runs with different arguments (e.g. a
+    manual sync for another company) are independent and queue normally.
+
+    Args:
+        background_tasks: The request's BackgroundTasks
+        job_name: Name identifying the job kind
+        job: Async job function
+        *args: Arguments passed to the job
+
+    Raises:
+        HTTPException: 409 if the same job with the same arguments is already running
+    """
+    job_key = (job_name, *args)
+    if job_key in _running_jobs:
+        logger.warning(f"{job_name}{args} is already running, refusing this trigger")
+        raise HTTPException(
+            status_code=409,
+            detail=f"{job_name} is already running with arguments {list(args)}"
+        )
+
+    _running_jobs.add(job_key)
+
+    async def run_job():
+        try:
+            await job(*args)
+        finally:
+            _running_jobs.discard(job_key)
+
+    background_tasks.add_task(run_job)
+
 
 def verify_cron_secret(x_cron_secret: Optional[str] = Header(None)):
     """
@@ -75,7 +124,7 @@ async def daily_update(
 
     # Add the job to background tasks so we can respond immediately
     # Use default parameters: all companies, 28 days back
-    background_tasks.add_task(sync_bluestakes_tickets, None, 28)
+    queue_exclusive_job(background_tasks, "sync_bluestakes_tickets", sync_bluestakes_tickets, None, 28)
 
     return {
         "status": "success",
@@ -113,7 +162,7 @@ async def send_weekly_project_digest_cron(
     logger.info("Send weekly project digest cron job triggered")
     
     # Add the job to background tasks so we can respond immediately
-    background_tasks.add_task(send_weekly_project_digest)
+    queue_exclusive_job(background_tasks, "send_weekly_project_digest", send_weekly_project_digest)
     
     return {
         "status": "success",
@@ -160,7 +209,7 @@ async def sync_bluestakes_data_cron(
         logger.info("Bluestakes sync triggered for all companies (via deprecated endpoint)")
 
     # Call the consolidated sync function
-    background_tasks.add_task(sync_bluestakes_tickets, company_id, 28)
+    queue_exclusive_job(background_tasks, "sync_bluestakes_tickets", sync_bluestakes_tickets, company_id, 28)
 
     return {
         "status": "success",
@@ -216,7 +265,7 @@ async def sync_bluestakes_tickets_cron(
         logger.info(f"BlueStakes tickets sync triggered for all companies, {days_back} days back")
 
     # Add the job to background tasks
-    background_tasks.add_task(sync_bluestakes_tickets, company_id, days_back)
+    queue_exclusive_job(background_tasks, "sync_bluestakes_tickets", sync_bluestakes_tickets, company_id, days_back)
 
     return {
         "status": "success",
@@ -5,9 +5,9 @@ Centralizes all email functionality for both manual and scheduled sending.
 import os
 import logging
 from typing import Dict, List, Optional
-from pathlib import Path
 import httpx
 from pydantic import BaseModel
+from utils.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -80,24 +80,25 @@ class EmailService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    NEXTJS_API_URL,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                logger.info(f"Email sent successfully via Next.js API: {result}")
-                
-                return {
-                    "status": "success",
-                    "message": "Email sent successfully",
-                    "email_id": result.get("id"),
-                    "to": to,
-                    "subject": subject
-                }
+            # Shared client: a digest run reuses one keep-alive connection instead of a TLS handshake per email
+            response = await get_http_client().post(
+                NEXTJS_API_URL,
+                json=payload,
+                headers=headers,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            logger.info(f"Email sent successfully via Next.js API: {result}")
+            
+            return {
+                "status": "success",
+                "message": "Email sent successfully",
+                "email_id": result.get("id"),
+                "to": to,
+                "subject": subject
+            }
                 
         except httpx.HTTPStatusError as e:
             error_msg = f"HTTP error {e.response.status_code}"
@@ -313,6 +314,9 @@ class EmailService:
     ) -> Dict:
         """
         Send an invitation email using the user_invitation.html template.
+
+        DEPRECATED: always raises; the invitation template has not been moved to the
+        Next.js API yet, so nothing is rendered or sent here.
         
         Args:
             email: Recipient email address
@@ -326,30 +330,6 @@ class EmailService:
         """
         EmailService._ensure_api_key()
         
-        # Load the invitation template
-        template_content = EmailService._load_template("user_invitation.html")
-        
-        # Template data
-        template_data = {
-            "recipient_name": name,
-            "company_name": company_name,
-            "user_role": role,
-            "invite_url": invite_url,
-            "company_address": "123 Main St, City, State 12345",  # You may want to make this configurable
-            "support_url": "https://underground-iq.com/support"
-        }
-        
-        # Render the template
-        html_content = EmailService._render_template(template_content, **template_data)
-        
-        # This method now uses the Next.js API instead of direct Resend
-        params = {
-            "from": "invites@underground-iq.com",
-            "to": [email],
-            "subject": f"You're invited to join {company_name} on UndergroundIQ",
-            "html": html_content,
-        }
-        
         try:
             # This method is deprecated and should use the new Next.js API
             raise ValueError(
@@ -0,0 +1,10 @@
+-- Partial index over companies that can be synced with BlueStakes.
+-- Matches the credential filter in get_companies_with_bluestakes_credentials
+-- (tasks/ticket_sync.py), so the sync only scans eligible companies.
+
+CREATE INDEX IF NOT EXISTS idx_companies_bluestakes_ready
+    ON companies (id)
+    WHERE bluestakes_username IS NOT NULL
+      AND bluestakes_username <> ''
+      AND bluestakes_password IS NOT NULL
+      AND bluestakes_password <> '';
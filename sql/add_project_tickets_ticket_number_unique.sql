@@ -0,0 +1,9 @@
+-- Unique ticket numbers for project_tickets.
+-- Required by the on_conflict="ticket_number" upserts in tasks/ticket_sync.py,
+-- which make ticket inserts safe to retry after transient failures.
+--
+-- Check for existing duplicates before running:
+--   SELECT ticket_number, COUNT(*) FROM project_tickets GROUP BY 1 HAVING COUNT(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_project_tickets_ticket_number
+    ON project_tickets (ticket_number);
@@ -0,0 +1,26 @@
+-- Indexes for the hot filters used by the ticket sync jobs.
+--
+-- get_updatable_ticket_candidates (tasks/updatable_tickets.py):
+--   WHERE company_id = ? AND is_continue_update = TRUE
+--     AND replace_by_date BETWEEN now() AND now() + 7 days
+-- Including ticket_number lets the planner answer it with an index-only scan.
+CREATE INDEX IF NOT EXISTS idx_project_tickets_company_continue_replace
+    ON project_tickets (company_id, is_continue_update, replace_by_date)
+    INCLUDE (ticket_number);
+
+-- link_orphaned_tickets (sql/link_orphaned_tickets.sql):
+--   WHERE project_id IS NULL AND old_ticket IS NOT NULL
+CREATE INDEX IF NOT EXISTS idx_project_tickets_orphans
+    ON project_tickets (company_id, old_ticket)
+    WHERE project_id IS NULL AND old_ticket IS NOT NULL;
+
+-- ticket_number lookups are covered by uq_project_tickets_ticket_number
+-- (sql/add_project_tickets_ticket_number_unique.sql).
+
+-- Continue-status updates (bulk_set_continue_status):
+--   WHERE ticket_number = ? AND company_id = ?
+-- No extra (company_id, ticket_number) WHERE is_continue_update index: the unique
+-- ticket_number index already resolves these to a single row, so a second index
+-- would only add write cost. These updates can't be HOT updates either, because
+-- is_continue_update is a key column of idx_project_tickets_company_continue_replace,
+-- so lowering the table's fillfactor would not help them.
@@ -0,0 +1,12 @@
+-- Unique ticket numbers for updatable_tickets.
+-- Lets bulk_insert_updatable_tickets (tasks/updatable_tickets.py) upsert with
+-- on_conflict="ticket_number" instead of checking for each ticket first.
+--
+-- Remove existing duplicates (keeping the oldest row) before adding the index:
+DELETE FROM updatable_tickets a
+    USING updatable_tickets b
+    WHERE a.ticket_number = b.ticket_number
+      AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_updatable_tickets_ticket_number
+    ON updatable_tickets (ticket_number);
@@ -0,0 +1,18 @@
+-- Set is_continue_update on many project tickets in one statement.
+-- Called by update_old_tickets_continue_status (tasks/ticket_sync.py) via
+-- get_service_client().rpc("bulk_set_continue_status", {"records": [...]}).
+--
+-- records: JSON array of {"ticket_number": text, "company_id": int, "is_continue_update": bool}
+-- Returns the (ticket_number, company_id) of every row that was updated.
+
+CREATE OR REPLACE FUNCTION bulk_set_continue_status(records jsonb)
+RETURNS TABLE (ticket_number text, company_id bigint)
+LANGUAGE sql
+AS $$
+    UPDATE project_tickets t
+       SET is_continue_update = r.is_continue_update
+      FROM jsonb_to_recordset(records) AS r(ticket_number text, company_id bigint, is_continue_update boolean)
+     WHERE t.ticket_number = r.ticket_number
+       AND t.company_id = r.company_id
+    RETURNING t.ticket_number::text, t.company_id::bigint;
+$$;
@@ -0,0 +1,17 @@
+-- Overwrite the responses of many project tickets in one statement.
+-- Called by bulk_write_responses (tasks/response_sync.py) via
+-- get_service_client().rpc("bulk_set_responses", {"records": [...]}).
+--
+-- records: JSON array of {"ticket_number": text, "responses": [...]}
+-- Returns the ticket_number of every row that was updated.
+
+CREATE OR REPLACE FUNCTION bulk_set_responses(records jsonb)
+RETURNS TABLE (ticket_number text)
+LANGUAGE sql
+AS $$
+    UPDATE project_tickets t
+       SET responses = r.responses
+      FROM jsonb_to_recordset(records) AS r(ticket_number text, responses jsonb)
+     WHERE t.ticket_number = r.ticket_number
+    RETURNING t.ticket_number::text;
+$$;
@@ -0,0 +1,21 @@
+-- Companies that can be synced with BlueStakes (credentials present and non-empty).
+-- Queried by get_companies_with_bluestakes_credentials (tasks/ticket_sync.py), which
+-- every sync job uses, so the credential filter is defined once here.
+-- The WHERE clause matches idx_companies_bluestakes_ready
+-- (sql/add_companies_bluestakes_ready_index.sql).
+--
+-- The view exposes BlueStakes credentials, so it runs with the caller's
+-- permissions (security_invoker, so the companies table's RLS applies) and is
+-- not readable by the anon/authenticated API roles at all; only the service
+-- role used by the sync jobs may select from it.
+
+CREATE OR REPLACE VIEW companies_with_bluestakes
+WITH (security_invoker = true) AS
+SELECT id, name, bluestakes_username, bluestakes_password
+  FROM companies
+ WHERE bluestakes_username IS NOT NULL
+   AND bluestakes_username <> ''
+   AND bluestakes_password IS NOT NULL
+   AND bluestakes_password <> '';
+
+REVOKE ALL ON companies_with_bluestakes FROM anon, authenticated;
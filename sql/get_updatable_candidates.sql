@@ -0,0 +1,27 @@
+-- Project tickets of one company that may be updatable and are not in updatable_tickets yet.
+-- Called by get_updatable_ticket_candidates (tasks/updatable_tickets.py) via
+-- get_service_client().rpc("get_updatable_candidates", {...}).
+--
+-- Uses idx_project_tickets_company_continue_replace (sql/add_sync_query_indexes.sql)
+-- for the range scan and uq_updatable_tickets_ticket_number for the anti-join.
+
+CREATE OR REPLACE FUNCTION get_updatable_candidates(
+    p_company_id bigint,
+    p_now timestamptz,
+    p_cutoff timestamptz
+)
+RETURNS TABLE (ticket_number text)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT pt.ticket_number::text
+      FROM project_tickets pt
+     WHERE pt.company_id = p_company_id
+       AND pt.is_continue_update = TRUE
+       AND pt.replace_by_date BETWEEN p_now AND p_cutoff
+       AND NOT EXISTS (
+               SELECT 1
+                 FROM updatable_tickets ut
+                WHERE ut.ticket_number = pt.ticket_number
+           );
+$$;
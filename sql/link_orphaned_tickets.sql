@@ -0,0 +1,37 @@
+-- Link orphaned project tickets to the project of the ticket they replace.
+-- Called by link_orphaned_tickets_to_projects (tasks/ticket_sync.py) via
+-- get_service_client().rpc("link_orphaned_tickets").
+--
+-- In one statement:
+-- 1. Tickets with project_id NULL and an old_ticket get the old ticket's
+--    project_id (same company only)
+-- 2. The old tickets that were linked from get is_continue_update = FALSE
+--
+-- Returns a single row with the number of tickets linked and old tickets updated.
+
+CREATE OR REPLACE FUNCTION link_orphaned_tickets()
+RETURNS TABLE (linked integer, old_tickets_updated integer)
+LANGUAGE sql
+AS $$
+    WITH linked_tickets AS (
+        UPDATE project_tickets orphan
+           SET project_id = parent.project_id
+          FROM project_tickets parent
+         WHERE orphan.project_id IS NULL
+           AND orphan.old_ticket IS NOT NULL
+           AND orphan.old_ticket <> ''
+           AND parent.ticket_number = orphan.old_ticket
+           AND parent.company_id = orphan.company_id
+           AND parent.project_id IS NOT NULL
+        RETURNING orphan.old_ticket, orphan.company_id
+    ), closed_tickets AS (
+        UPDATE project_tickets old
+           SET is_continue_update = FALSE
+          FROM (SELECT DISTINCT old_ticket, company_id FROM linked_tickets) l
+         WHERE old.ticket_number = l.old_ticket
+           AND old.company_id = l.company_id
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM linked_tickets)::integer,
+           (SELECT COUNT(*) FROM closed_tickets)::integer;
+$$;
@@ -0,0 +1,23 @@
+-- One row per assigned user, de-duplicated by email (case-insensitive).
+-- Called by get_unique_assigned_users (tasks/user_management.py) via
+-- get_service_client().rpc("unique_assigned_users").
+--
+-- When an email appears on several assignments, the most recently assigned
+-- row's name wins. Rows come back ordered by lower-cased email.
+
+CREATE OR REPLACE FUNCTION unique_assigned_users()
+RETURNS TABLE (email text, name text)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT email, name
+      FROM (
+            SELECT DISTINCT ON (lower(trim(user_email)))
+                   trim(user_email)::text AS email,
+                   user_name::text AS name
+              FROM project_assignments
+             WHERE coalesce(trim(user_email), '') <> ''
+             ORDER BY lower(trim(user_email)), assigned_at DESC NULLS LAST
+           ) users
+     ORDER BY lower(email);
+$$;
@@ -0,0 +1,31 @@
+-- Every assigned user with each of their assigned projects, one row per (user, project).
+-- Called by get_weekly_digest_assignments (tasks/user_management.py) via
+-- get_service_client().rpc("weekly_digest_assignments"), so the weekly digest
+-- needs one call instead of one project lookup per user.
+--
+-- Users are de-duplicated the same way as unique_assigned_users()
+-- (sql/unique_assigned_users.sql), which must be installed first; assignments
+-- match users case-insensitively. Rows come back ordered by lower-cased email,
+-- then project name and id.
+
+CREATE OR REPLACE FUNCTION weekly_digest_assignments()
+RETURNS TABLE (
+    email text,
+    name text,
+    project_id projects.id%TYPE,
+    project_name projects.name%TYPE,
+    company_id projects.company_id%TYPE
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT u.email, u.name, p.id, p.name, p.company_id
+      FROM unique_assigned_users() u
+      JOIN (
+            SELECT DISTINCT lower(trim(user_email)) AS email_key, project_id
+              FROM project_assignments
+             WHERE project_id IS NOT NULL
+           ) a ON a.email_key = lower(u.email)
+      JOIN projects p ON p.id = a.project_id
+     ORDER BY lower(u.email), p.name, p.id;
+$$;
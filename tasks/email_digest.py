@@ -3,16 +3,41 @@ Email digest functions for weekly project reports.
 These functions handle the generation and sending of weekly project digest emails
 to assigned users, including data aggregation and formatting.
 """
+import asyncio
 import logging
+from collections import defaultdict
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import pytz
-from config.supabase_client import get_service_client
-from utils.bluestakes import get_bluestakes_auth_token, get_ticket_details
-from utils.encryption import safe_decrypt_password, EncryptionError
+from config.supabase_client import get_service_client, execute_async
+from services.email_service import EmailService, Project, Ticket
+from utils.bluestakes import get_ticket_details, format_street_location
+from utils.bluestakes_token_manager import get_token_for_company
+from .user_management import get_weekly_digest_assignments
 
 logger = logging.getLogger(__name__)
 
+# Timezone the digest's new/expiring ticket windows and dates are computed in
+DIGEST_TIMEZONE = pytz.timezone('America/Denver')
+
+# Number of digest emails sent at the same time
+EMAIL_SEND_CONCURRENCY = 2
+
+# Maximum prepared digests waiting to be sent
+EMAIL_QUEUE_SIZE = 50
+
+# Projects per bulk ticket query (keeps the IN list well inside URL length limits)
+DIGEST_PROJECT_CHUNK_SIZE = 200
+
+# Rows fetched per page by the bulk ticket query
+DIGEST_TICKET_PAGE_SIZE = 1000
+
+# Ticket locations fetched from the BlueStakes API, kept per process (oldest dropped first)
+TICKET_LOCATION_CACHE_SIZE = 4096
+_ticket_location_cache: Dict[str, str] = {}
+
 
 async def send_weekly_project_digest():
     """
@@ -25,18 +50,18 @@ async def send_weekly_project_digest():
     4. Sends individual weekly update emails using the 'weeklyUpdate' template
     5. Calculates new tickets (legal date within 7 days) and expiring tickets (expires within 7 days)
     
-    This is the bulk email process that aggregates all users and sends emails one at a time.
+    This is the bulk email process that aggregates all users. Users and their projects
+    come from one get_weekly_digest_assignments call, then the tickets and companies
+    of all their projects are loaded in bulk; emails are sent by
+    EMAIL_SEND_CONCURRENCY sender workers while the next digests are prepared.
     """
     logger.info("Starting weekly project digest job")
     
     try:
-        from services.email_service import EmailService
-        from .user_management import get_unique_assigned_users, get_assigned_projects_for_user
-        
-        # Get all unique assigned users
-        users = await get_unique_assigned_users()
+        # Get all assigned users with their projects
+        assignments = await get_weekly_digest_assignments()
         
-        if not users:
+        if not assignments:
             logger.warning("No assigned users found for weekly digest")
             return {
                 "status": "completed",
@@ -52,29 +77,51 @@ async def send_weekly_project_digest():
         # Format dates for template
         week_start_str = week_start.strftime("%B %d")
         week_end_str = week_end.strftime("%B %d")
+
+        # Every user's digest counts new/expiring tickets against the same moment
+        report_now = datetime.now(DIGEST_TIMEZONE)
         
         emails_sent = 0
         errors = []
-        
-        # Process each user
-        for user in users:
+
+        # Emails are handed to a small pool of sender workers so the next user's
+        # digest is prepared while earlier emails are still being sent
+        email_queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+
+        async def email_sender():
+            nonlocal emails_sent
+            while True:
+                user_email, user_digest_data = await email_queue.get()
+                try:
+                    await EmailService.send_weekly_update(
+                        to=[user_email],
+                        company_name=user_digest_data["company_name"],
+                        projects=user_digest_data["projects"],
+                        total_tickets=user_digest_data["total_tickets"],
+                        new_tickets=user_digest_data["new_tickets"],
+                        expiring_tickets=user_digest_data["expiring_tickets"],
+                        report_date=user_digest_data["report_date"]
+                    )
+                    emails_sent += 1
+                except Exception as e:
+                    error_msg = f"Error sending digest to {user_email}: {str(e)}"
+                    logger.error(error_msg)
+                    errors.append(error_msg)
+                finally:
+                    email_queue.task_done()
+
+        # Users share projects: load the tickets and companies of every project once, in bulk
+        all_projects = {project["id"]: project for _, user_projects in assignments for project in user_projects}
+        project_tickets_by_id = await get_project_tickets_for_digest_bulk(list(all_projects))
+        company_info_by_project = await get_company_info_for_digest_bulk(list(all_projects.values()))
+
+        async def prepare_user_digest(user: Dict[str, Any], user_projects: List[Dict[str, Any]]) -> None:
             try:
                 user_email = user["email"]
-                user_name = user.get("name", "User").split(" ")[0]
-                
-                # Get projects assigned to this user
-                user_projects = await get_assigned_projects_for_user(user_email)
-                
-                if not user_projects:
-                    continue
-                
-                # Get tickets for each project
+
                 projects_data = []
-                total_tickets = 0
-                
                 for project in user_projects:
-                    project_tickets = await get_project_tickets_for_digest(project["id"])
-                    
+                    project_tickets = project_tickets_by_id.get(project["id"])
                     if project_tickets:
                         projects_data.append({
                             "project_id": project["id"],
@@ -82,41 +129,44 @@ async def send_weekly_project_digest():
                             "tickets": project_tickets,
                             "ticket_count": len(project_tickets)
                         })
-                        total_tickets += len(project_tickets)
-                
+
                 if not projects_data:
-                    continue
-                
+                    return
+
                 # Get company information (assuming all projects belong to the same company)
-                company_info = await get_company_info_for_digest(projects_data[0]["project_id"])
-                
+                company_info = company_info_by_project.get(projects_data[0]["project_id"]) or {"name": "UndergroundIQ"}
+
                 # Transform data for new Next.js API format
                 user_digest_data = await prepare_user_digest_data(
                     projects_data, 
                     company_info,
                     week_start_str,
                     week_end_str,
-                    week_start.year
-                )
-                
-                # Send email using new Next.js API
-                result = await EmailService.send_weekly_update(
-                    to=[user_email],
-                    company_name=user_digest_data["company_name"],
-                    projects=user_digest_data["projects"],
-                    total_tickets=user_digest_data["total_tickets"],
-                    new_tickets=user_digest_data["new_tickets"],
-                    expiring_tickets=user_digest_data["expiring_tickets"],
-                    report_date=user_digest_data["report_date"]
+                    week_start.year,
+                    now=report_now
                 )
-                
-                emails_sent += 1
-                
+
             except Exception as e:
                 error_msg = f"Error sending digest to {user.get('email', 'unknown')}: {str(e)}"
                 logger.error(error_msg)
                 errors.append(error_msg)
-                continue
+                return
+
+            # Queue the email for the sender workers (Next.js API)
+            await email_queue.put((user_email, user_digest_data))
+
+        senders = [asyncio.create_task(email_sender()) for _ in range(EMAIL_SEND_CONCURRENCY)]
+
+        try:
+            for user, user_projects in assignments:
+                await prepare_user_digest(user, user_projects)
+
+            # Wait for every queued email to be sent
+            await email_queue.join()
+        finally:
+            for sender in senders:
+                sender.cancel()
+            await asyncio.gather(*senders, return_exceptions=True)
         
         logger.info(f"Weekly project digest job completed: {emails_sent} emails sent, {len(errors)} errors")
         
@@ -148,40 +198,7 @@ def format_location_from_bluestakes(bluestakes_data: Dict[str, Any]) -> str:
         Formatted location string
     """
     try:
-        street = bluestakes_data.get("street")
-        st_from_address = bluestakes_data.get("st_from_address")
-        st_to_address = bluestakes_data.get("st_to_address")
-        cross1 = bluestakes_data.get("cross1")
-        cross2 = bluestakes_data.get("cross2")
-        
-        if not street:
-            return "Location not available"
-        
-        location_parts = []
-        
-        # Handle street with from/to addresses
-        if st_from_address and st_to_address and st_from_address != "0" and st_to_address != "0":
-            if st_from_address == st_to_address:
-                location_parts.append(f"{st_from_address} {street}")
-            else:
-                location_parts.append(f"{st_from_address}-{st_to_address} {street}")
-        else:
-            location_parts.append(street)
-        
-        # Add cross streets if available
-        cross_streets = []
-        if cross1 and cross1 != " ":
-            cross_streets.append(cross1)
-        if cross2 and cross2 != " ":
-            cross_streets.append(cross2)
-        
-        if cross_streets:
-            if len(cross_streets) == 1:
-                location_parts.append(f"at {cross_streets[0]}")
-            else:
-                location_parts.append(f"between {cross_streets[0]} and {cross_streets[1]}")
-        
-        return " ".join(location_parts)
+        return format_street_location(bluestakes_data) or "Location not available"
         
     except Exception as e:
         logger.error(f"Error formatting location: {str(e)}")
@@ -192,6 +209,10 @@ async def get_ticket_location_from_bluestakes(ticket_number: str) -> str:
     """
     Get location information for a ticket from bluestakes data.
     First checks local database, then fetches from bluestakes API if needed.
+
+    API results are kept in a small per-process cache, and the BlueStakes token
+    comes from the per-company token cache, so repeated lookups cost no
+    credential queries or logins.
     
     Args:
         ticket_number: The ticket number
@@ -199,65 +220,73 @@ async def get_ticket_location_from_bluestakes(ticket_number: str) -> str:
     Returns:
         Formatted location string
     """
+    if ticket_number in _ticket_location_cache:
+        return _ticket_location_cache[ticket_number]
+
     try:
-        # Fetch directly from bluestakes API (no local database caching)
-        # We need to get company credentials for this ticket
-        company_result = (get_service_client()
-                         .table("project_tickets")
-                         .select("company_id")
-                         .eq("ticket_number", ticket_number)
-                         .limit(1)
-                         .execute())
-        
-        if not company_result.data:
-            return "Location not available"
-        
-        company_id = company_result.data[0]["company_id"]
-        
-        # Get company bluestakes credentials
-        company_creds = (get_service_client()
-                        .schema("public")
-                        .table("companies")
-                        .select("bluestakes_username, bluestakes_password")
-                        .eq("id", company_id)
-                        .not_.is_("bluestakes_username", "null")
-                        .not_.is_("bluestakes_password", "null")
-                        .execute())
-        
-        if not company_creds.data:
+        # The sync stores a formatted_address for every ticket; only fall back to the API without one
+        ticket_result = await execute_async(get_service_client()
+                                            .table("project_tickets")
+                                            .select("company_id, formatted_address")
+                                            .eq("ticket_number", ticket_number)
+                                            .limit(1))
+        
+        if not ticket_result.data:
             return "Location not available"
+
+        ticket_row = ticket_result.data[0]
+        if ticket_row.get("formatted_address"):
+            return ticket_row["formatted_address"]
         
-        try:
-            # Decrypt the password before using it
-            decrypted_password = safe_decrypt_password(company_creds.data[0]["bluestakes_password"])
-        except EncryptionError as e:
-            logger.error(f"Failed to decrypt password for company {company_id}: {str(e)}")
-            return "Location not available"
+        return await _fetch_ticket_location(ticket_number, ticket_row["company_id"])
         
-        # Fetch from bluestakes API (with caching)
-        token = await get_bluestakes_auth_token(
-            company_creds.data[0]["bluestakes_username"],
-            decrypted_password,
-            company_id  # Pass company_id for token caching
-        )
+    except Exception as e:
+        logger.error("Error getting location for ticket %s: %s", ticket_number, e)
+        return "Location not available"
+
+
+async def _fetch_ticket_location(ticket_number: str, company_id: int) -> str:
+    """
+    Fetch and format a ticket's location from the BlueStakes API (cached per process).
+
+    Args:
+        ticket_number: The ticket number
+        company_id: Company the ticket belongs to (for the BlueStakes token)
+
+    Returns:
+        Formatted location string
+    """
+    if ticket_number in _ticket_location_cache:
+        return _ticket_location_cache[ticket_number]
+
+    try:
+        # Cached token for the company (looks up and decrypts credentials only when it has to log in)
+        token = await get_token_for_company(company_id)
         
         # Get the specific ticket directly
         ticket_data = await get_ticket_details(token, ticket_number)
         
-        if ticket_data and not ticket_data.get("error"):
-            return format_location_from_bluestakes(ticket_data)
-        
-        return "Location not available"
-        
+        if not ticket_data or ticket_data.get("error"):
+            return "Location not available"
+
+        location = format_location_from_bluestakes(ticket_data)
+
     except Exception as e:
-        logger.error(f"Error getting location for ticket {ticket_number}: {str(e)}")
+        logger.error("Error getting location for ticket %s: %s", ticket_number, e)
         return "Location not available"
 
+    if len(_ticket_location_cache) >= TICKET_LOCATION_CACHE_SIZE:
+        # Drop the oldest entry (dicts keep insertion order)
+        del _ticket_location_cache[next(iter(_ticket_location_cache))]
+    _ticket_location_cache[ticket_number] = location
+
+    return location
+
 
 async def get_project_tickets_for_digest(project_id: int) -> List[Dict[str, Any]]:
     """
     Get active tickets for a project that should be included in the weekly digest.
-    Uses cached formatted_address from database for improved performance.
+    (Single-project form of get_project_tickets_for_digest_bulk)
 
     Args:
         project_id: The project ID to get tickets for
@@ -265,57 +294,113 @@ async def get_project_tickets_for_digest(project_id: int) -> List[Dict[str, Any]
     Returns:
         List of ticket dictionaries with formatted data including location
     """
-    try:
-        # Query for active tickets in the project (only continue update tickets)
-        # Now includes formatted_address to avoid individual API calls
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .select("ticket_number, replace_by_date, legal_date, is_continue_update, formatted_address")
-                 .eq("project_id", project_id)
-                 .eq("is_continue_update", True)
-                 .not_.is_("replace_by_date", "null")
-                 .execute())
-
-        if not result.data:
-            return []
-
-        # Format tickets for template
-        formatted_tickets = []
-        for ticket in result.data:
-            # Format dates as "weekday, month date" (e.g., "Monday, January 15")
-            replace_by_date = datetime.fromisoformat(ticket["replace_by_date"].replace("Z", "+00:00"))
-            replace_by_formatted = replace_by_date.strftime("%A, %B %d")
-
-            legal_date_formatted = "N/A"
-            if ticket.get("legal_date"):
-                legal_date = datetime.fromisoformat(ticket["legal_date"].replace("Z", "+00:00"))
-                legal_date_formatted = legal_date.strftime("%A, %B %d")
-
-            # All tickets in digest are continue update tickets
-            ticket_meta = "Continue Update"
-
-            # Use cached formatted_address from database instead of making API calls
-            location = ticket.get("formatted_address") or "Location not available"
-            
-            formatted_tickets.append({
-                "ticket_number": ticket["ticket_number"],
-                "replace_by_date_formatted": replace_by_formatted,
-                "legal_date_formatted": legal_date_formatted,
-                "ticket_meta": ticket_meta,
-                "location": location,
-                # Add raw datetime objects for new API
-                "replace_by_date_raw": replace_by_date,
-                "legal_date_raw": legal_date if ticket.get("legal_date") else None
-            })
-        
-        # Sort by replace_by_date (soonest first)
-        formatted_tickets.sort(key=lambda t: t["replace_by_date_formatted"])
-        
-        return formatted_tickets
-        
-    except Exception as e:
-        logger.error(f"Error getting project tickets for digest (project {project_id}): {str(e)}")
-        return []
+    tickets_by_project = await get_project_tickets_for_digest_bulk([project_id])
+    return tickets_by_project.get(project_id, [])
+
+
+async def get_project_tickets_for_digest_bulk(project_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Get the weekly digest tickets of many projects with one query per chunk of projects.
+    Uses cached formatted_address from database for improved performance; tickets
+    without one show "Location not available" (the digest makes no BlueStakes calls).
+
+    Args:
+        project_ids: The project IDs to get tickets for
+
+    Returns:
+        Dict mapping project ID to its formatted tickets (projects without tickets are left out)
+    """
+    tickets_by_project = defaultdict(list)
+
+    for start in range(0, len(project_ids), DIGEST_PROJECT_CHUNK_SIZE):
+        chunk = project_ids[start:start + DIGEST_PROJECT_CHUNK_SIZE]
+        try:
+            # Query for active tickets in the projects (only continue update tickets),
+            # paged by id so large projects aren't cut off at the API's row limit
+            last_id = None
+            while True:
+                query = (get_service_client()
+                         .table("project_tickets")
+                         .select("id, project_id, ticket_number, replace_by_date, legal_date, formatted_address")
+                         .in_("project_id", chunk)
+                         .eq("is_continue_update", True)
+                         .not_.is_("replace_by_date", "null"))
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+
+                result = await execute_async(query.order("id").limit(DIGEST_TICKET_PAGE_SIZE))
+                rows = result.data or []
+
+                for ticket in rows:
+                    try:
+                        tickets_by_project[ticket["project_id"]].append(_format_digest_ticket(ticket))
+                    except Exception as e:
+                        logger.warning("Error formatting ticket %s for digest: %s", ticket.get("ticket_number", "unknown"), e)
+
+                if len(rows) < DIGEST_TICKET_PAGE_SIZE:
+                    break
+                last_id = rows[-1]["id"]
+
+        except Exception as e:
+            logger.error(f"Error getting project tickets for digest ({len(chunk)} projects): {str(e)}")
+            continue
+
+    # Sort by replace_by_date (soonest first); the formatted string would sort by weekday name
+    for project_tickets in tickets_by_project.values():
+        project_tickets.sort(key=itemgetter("replace_by_date_raw"))
+
+    return dict(tickets_by_project)
+
+
+@lru_cache(maxsize=1024)
+def _parse_digest_date(value: str) -> Tuple[datetime, str]:
+    """
+    Parse a stored date and format it as "weekday, month date" (e.g., "Monday, January 15").
+
+    Cached: tickets in a digest share a small set of dates.
+    """
+    parsed = datetime.fromisoformat(value)
+    return parsed, parsed.strftime("%A, %B %d")
+
+
+@lru_cache(maxsize=1024)
+def _localize_digest_date(value: Optional[datetime]) -> Tuple[Optional[datetime], Optional[str]]:
+    """
+    Convert a stored (UTC) ticket date to DIGEST_TIMEZONE, with its YYYY-MM-DD string.
+
+    Cached: the same ticket dates recur across every user sharing a project.
+    Returns (None, None) for a missing date.
+    """
+    if not value:
+        return None, None
+    if value.tzinfo is None:
+        localized = pytz.utc.localize(value).astimezone(DIGEST_TIMEZONE)
+    else:
+        localized = value.astimezone(DIGEST_TIMEZONE)
+    return localized, localized.date().isoformat()
+
+
+def _format_digest_ticket(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a project_tickets row for the digest template."""
+    replace_by_date, replace_by_formatted = _parse_digest_date(ticket["replace_by_date"])
+
+    legal_date = None
+    legal_date_formatted = "N/A"
+    if ticket.get("legal_date"):
+        legal_date, legal_date_formatted = _parse_digest_date(ticket["legal_date"])
+
+    return {
+        "ticket_number": ticket["ticket_number"],
+        "replace_by_date_formatted": replace_by_formatted,
+        "legal_date_formatted": legal_date_formatted,
+        # All tickets in digest are continue update tickets
+        "ticket_meta": "Continue Update",
+        # Use cached formatted_address from database instead of making API calls
+        "location": ticket.get("formatted_address") or "Location not available",
+        # Add raw datetime objects for new API
+        "replace_by_date_raw": replace_by_date,
+        "legal_date_raw": legal_date
+    }
 
 
 async def get_company_info_for_digest(project_id: int) -> Dict[str, Any]:
@@ -330,41 +415,64 @@ async def get_company_info_for_digest(project_id: int) -> Dict[str, Any]:
     """
     try:
         # Get project to find company
-        project_result = (get_service_client()
-                        .table("projects")
-                        .select("company_id")
-                        .eq("id", project_id)
-                        .execute())
+        project_result = await execute_async(get_service_client()
+                                             .table("projects")
+                                             .select("id, company_id")
+                                             .eq("id", project_id))
         
         if not project_result.data:
             return {"name": "UndergroundIQ"}
-        
-        company_id = project_result.data[0]["company_id"]
-        
-        # Get company details
-        company_result = (get_service_client()
-                         .schema("public")
-                         .table("companies")
-                         .select("name")
-                         .eq("id", company_id)
-                         .execute())
-        
-        if company_result.data:
-            return company_result.data[0]
-        else:
-            return {"name": "UndergroundIQ"}
+
+        company_info = await get_company_info_for_digest_bulk(project_result.data)
+        return company_info.get(project_id) or {"name": "UndergroundIQ"}
             
     except Exception as e:
         logger.error(f"Error getting company info for digest (project {project_id}): {str(e)}")
         return {"name": "UndergroundIQ"}
 
 
+async def get_company_info_for_digest_bulk(projects: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Get company information for many projects with one companies query.
+
+    Args:
+        projects: Project rows with at least id and company_id
+
+    Returns:
+        Dict mapping project ID to company information (projects whose company
+        can't be found are left out)
+    """
+    company_ids = list({project["company_id"] for project in projects if project.get("company_id") is not None})
+    if not company_ids:
+        return {}
+
+    try:
+        company_result = await execute_async(get_service_client()
+                                             .schema("public")
+                                             .table("companies")
+                                             .select("id, name")
+                                             .in_("id", company_ids))
+
+        companies = {company["id"]: {"name": company["name"]} for company in company_result.data or []}
+
+    except Exception as e:
+        logger.error(f"Error getting company info for digest ({len(company_ids)} companies): {str(e)}")
+        return {}
+
+    return {
+        project["id"]: companies[project["company_id"]]
+        for project in projects
+        if project.get("company_id") in companies
+    }
+
+
 async def prepare_user_digest_data(
     projects_data: List[Dict[str, Any]], 
     company_info: Dict[str, Any],
     week_start_str: str,
     week_end_str: str,
-    year: int
+    year: int,
+    now: Optional[datetime] = None
 ) -> Dict[str, Any]:
     """
     Transform project data into the format required by the Next.js API.
@@ -375,13 +483,12 @@ async def prepare_user_digest_data(
         week_start_str: Week start string (e.g., "January 15")
         week_end_str: Week end string (e.g., "January 19")
         year: Year for the report
+        now: Report time (defaults to now); send_weekly_project_digest passes one
+             shared value for the whole run
         
     Returns:
         Dict with data formatted for send_weekly_update()
     """
-    from services.email_service import Project, Ticket
-    from datetime import datetime, timedelta
-    
     # Convert projects data to new format
     new_projects = []
     new_tickets_count = 0
@@ -389,8 +496,9 @@ async def prepare_user_digest_data(
     total_tickets = 0
     
     # Use America/Denver timezone for all datetime comparisons
-    denver_tz = pytz.timezone('America/Denver')
-    today = datetime.now(denver_tz)
+    denver_tz = DIGEST_TIMEZONE
+    today = now.astimezone(denver_tz) if now else datetime.now(denver_tz)
+    today_str = today.date().isoformat()
     seven_days_ago = today - timedelta(days=7)
     seven_days_from_now = today + timedelta(days=7)
     
@@ -398,30 +506,13 @@ async def prepare_user_digest_data(
         tickets = []
         for ticket_data in project_data["tickets"]:
             try:
-                # Use the raw datetime objects we added
-                legal_date_raw = ticket_data.get("legal_date_raw")
-                replace_by_date_raw = ticket_data.get("replace_by_date_raw")
-                
-                # Convert database datetime objects to Denver timezone for comparison
-                legal_date_denver = None
-                if legal_date_raw:
-                    # Convert UTC datetime to Denver timezone
-                    if legal_date_raw.tzinfo is None:
-                        legal_date_denver = pytz.utc.localize(legal_date_raw).astimezone(denver_tz)
-                    else:
-                        legal_date_denver = legal_date_raw.astimezone(denver_tz)
-                
-                replace_by_date_denver = None
-                if replace_by_date_raw:
-                    # Convert UTC datetime to Denver timezone
-                    if replace_by_date_raw.tzinfo is None:
-                        replace_by_date_denver = pytz.utc.localize(replace_by_date_raw).astimezone(denver_tz)
-                    else:
-                        replace_by_date_denver = replace_by_date_raw.astimezone(denver_tz)
-                
-                # Convert to YYYY-MM-DD format for the API
-                legal_date = legal_date_denver.strftime("%Y-%m-%d") if legal_date_denver else today.strftime("%Y-%m-%d")
-                expires_date = replace_by_date_denver.strftime("%Y-%m-%d") if replace_by_date_denver else today.strftime("%Y-%m-%d")
+                # Use the raw datetime objects we added, converted to Denver timezone for comparison
+                legal_date_denver, legal_date = _localize_digest_date(ticket_data.get("legal_date_raw"))
+                replace_by_date_denver, expires_date = _localize_digest_date(ticket_data.get("replace_by_date_raw"))
+
+                # YYYY-MM-DD format for the API (today when the date is missing)
+                legal_date = legal_date or today_str
+                expires_date = expires_date or today_str
                 
                 # Count new tickets (legal date within 7 days) - now timezone-aware comparison
                 if legal_date_denver and legal_date_denver >= seven_days_ago:
@@ -441,7 +532,7 @@ async def prepare_user_digest_data(
                 total_tickets += 1
                 
             except Exception as e:
-                logger.warning(f"Error processing ticket {ticket_data.get('ticket_number', 'unknown')}: {e}")
+                logger.warning("Error processing ticket %s: %s", ticket_data.get("ticket_number", "unknown"), e)
                 continue
         
         if tickets:
@@ -0,0 +1,23 @@
+"""
+Helpers for the statistics dicts returned by background jobs.
+"""
+from typing import Dict, Any
+
+# Maximum number of error messages kept in a job's stats; the rest are only counted
+MAX_ERRORS = 50
+
+
+def record_error(stats: Dict[str, Any], error_msg: str) -> None:
+    """
+    Record an error in a job's stats without letting the list grow unbounded.
+
+    Every error increments stats["errors_total"]; only the first MAX_ERRORS
+    messages are kept in stats["errors"].
+
+    Args:
+        stats: Job statistics dict with an "errors" list
+        error_msg: Error message to record
+    """
+    stats["errors_total"] = stats.get("errors_total", 0) + 1
+    if len(stats["errors"]) < MAX_ERRORS:
+        stats["errors"].append(error_msg)
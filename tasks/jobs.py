@@ -12,12 +12,20 @@ All functions are re-exported from this module to maintain backward compatibilit
 Note: ticket_data_sync.py has been consolidated into ticket_sync.py
 """
 
+import logging
+
+from utils.bluestakes import get_ticket_details, transform_bluestakes_ticket_to_project_ticket
+from utils.bluestakes_token_manager import get_token_for_company
+
+logger = logging.getLogger(__name__)
+
 # Import all functions from the new modules to maintain backward compatibility
 
 # User management functions
 from .user_management import (
     get_assigned_projects_for_user,
-    get_unique_assigned_users
+    get_unique_assigned_users,
+    get_weekly_digest_assignments
 )
 
 # Ticket synchronization functions (consolidated insert + update)
@@ -28,10 +36,12 @@ from .ticket_sync import (
     get_company_with_bluestakes_credentials,
     ticket_exists,
     insert_project_ticket,
+    bulk_insert_project_tickets,
     update_project_ticket,
     get_existing_ticket_sync_status,
     link_orphaned_tickets_to_projects,
-    update_old_ticket_continue_status
+    update_old_ticket_continue_status,
+    update_old_tickets_continue_status
 )
 
 # Updatable tickets functions
@@ -39,14 +49,17 @@ from .updatable_tickets import (
     sync_updateable_tickets,
     get_companies_for_updateable_sync,
     get_updatable_ticket_candidates,
-    insert_updatable_ticket
+    insert_updatable_ticket,
+    bulk_insert_updatable_tickets
 )
 
 # Email digest functions
 from .email_digest import (
     send_weekly_project_digest,
     get_project_tickets_for_digest,
+    get_project_tickets_for_digest_bulk,
     get_company_info_for_digest,
+    get_company_info_for_digest_bulk,
     prepare_user_digest_data,
     format_location_from_bluestakes,
     get_ticket_location_from_bluestakes
@@ -58,9 +71,11 @@ async def should_sync_ticket_data(ticket_number: str, max_age_hours: int = 24) -
     """
     DEPRECATED: Use get_existing_ticket_sync_status instead.
     Check if a ticket's Bluestakes data should be synced based on age.
+
+    Sync is now change-based, so every existing ticket needs a sync; only the
+    existence check is done, without fetching the ticket's data.
     """
-    status = await get_existing_ticket_sync_status(ticket_number, max_age_hours)
-    return status["needs_sync"]
+    return await ticket_exists(ticket_number)
 
 
 async def update_project_ticket_bluestakes_data(ticket_number: str, company_id: int) -> bool:
@@ -70,14 +85,6 @@ async def update_project_ticket_bluestakes_data(ticket_number: str, company_id:
 
     To update a single ticket, use sync_bluestakes_tickets with appropriate date range.
     """
-    from config.supabase_client import get_service_client
-    from utils.bluestakes import get_ticket_details
-    from utils.bluestakes_token_manager import get_token_for_company
-    from utils.bluestakes import transform_bluestakes_ticket_to_project_ticket
-    import logging
-
-    logger = logging.getLogger(__name__)
-
     try:
         # Get token and fetch ticket details
         token = await get_token_for_company(company_id)
@@ -105,9 +112,6 @@ async def sync_existing_tickets_bluestakes_data(company_id: int = None, batch_si
 
     For backward compatibility, this now calls sync_bluestakes_tickets.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-
     logger.warning("sync_existing_tickets_bluestakes_data is deprecated. "
                   "Use sync_bluestakes_tickets instead for consolidated sync.")
 
@@ -119,6 +123,7 @@ __all__ = [
     # User management
     'get_assigned_projects_for_user',
     'get_unique_assigned_users',
+    'get_weekly_digest_assignments',
 
     # Ticket synchronization (consolidated)
     'sync_bluestakes_tickets',
@@ -127,21 +132,26 @@ __all__ = [
     'get_company_with_bluestakes_credentials',
     'ticket_exists',
     'insert_project_ticket',
+    'bulk_insert_project_tickets',
     'update_project_ticket',
     'get_existing_ticket_sync_status',
     'link_orphaned_tickets_to_projects',
     'update_old_ticket_continue_status',
+    'update_old_tickets_continue_status',
 
     # Updatable tickets
     'sync_updateable_tickets',
     'get_companies_for_updateable_sync',
     'get_updatable_ticket_candidates',
     'insert_updatable_ticket',
+    'bulk_insert_updatable_tickets',
 
     # Email digest
     'send_weekly_project_digest',
     'get_project_tickets_for_digest',
+    'get_project_tickets_for_digest_bulk',
     'get_company_info_for_digest',
+    'get_company_info_for_digest_bulk',
     'prepare_user_digest_data',
     'format_location_from_bluestakes',
     'get_ticket_location_from_bluestakes',
@@ -5,12 +5,26 @@ These functions handle syncing responses data from BlueStakes API to project_tic
 import asyncio
 import logging
 from datetime import datetime, timezone, date
-from typing import Dict, Any, Optional, List
-from config.supabase_client import get_service_client
+from typing import Dict, Any, Optional, List, Set
+from postgrest.exceptions import APIError
+from config.supabase_client import get_service_client, execute_async, execute_with_retry
 from utils.bluestakes import get_ticket_responses
+from tasks.job_stats import record_error
 
 logger = logging.getLogger(__name__)
 
+# Active tickets fetched per page when syncing responses
+RESPONSE_SYNC_PAGE_SIZE = 1000
+
+# BlueStakes response fetches in flight at once (the shared limiter may allow fewer)
+RESPONSE_FETCH_CONCURRENCY = 16
+
+# Fetched responses written per bulk update
+RESPONSE_WRITE_BATCH_SIZE = 500
+
+# PostgREST error code returned when an RPC function does not exist
+UNDEFINED_FUNCTION_CODE = "PGRST202"
+
 
 async def sync_ticket_responses(ticket_number: str, company_id: int) -> bool:
     """
@@ -24,35 +38,76 @@ async def sync_ticket_responses(ticket_number: str, company_id: int) -> bool:
         True if sync was successful, False otherwise
     """
     try:
-        # Get ticket responses (uses cached token + auto-retry internally)
-        response_data = await get_ticket_responses(
-            ticket_number,
-            company_id
-        )
-
-        if not response_data:
-            logger.warning(f"Could not fetch responses for ticket {ticket_number}")
+        responses_array = await fetch_ticket_responses(ticket_number, company_id)
+        if responses_array is None:
             return False
 
-        # Extract the responses array from the response
-        responses_array = response_data.get("responses", [])
+        updated = await bulk_write_responses([{"ticket_number": ticket_number, "responses": responses_array}])
+        return ticket_number in updated
 
-        # Update the ticket's responses column (overwrites existing data)
-        update_data = {
-            "responses": responses_array
-        }
+    except Exception as e:
+        logger.error("Error syncing responses for ticket %s: %s", ticket_number, e)
+        return False
 
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .update(update_data)
-                 .eq("ticket_number", ticket_number)
-                 .execute())
 
-        return bool(result.data)
+async def fetch_ticket_responses(ticket_number: str, company_id: int) -> Optional[List[Any]]:
+    """
+    Fetch a ticket's responses array from BlueStakes (no database write).
 
-    except Exception as e:
-        logger.error(f"Error syncing responses for ticket {ticket_number}: {str(e)}")
-        return False
+    Args:
+        ticket_number: The ticket number to fetch responses for
+        company_id: The company ID for authentication
+
+    Returns:
+        The responses array, or None if BlueStakes returned nothing
+    """
+    # Get ticket responses (uses cached token + auto-retry internally)
+    response_data = await get_ticket_responses(ticket_number, company_id)
+
+    if not response_data:
+        logger.warning("Could not fetch responses for ticket %s", ticket_number)
+        return None
+
+    # Extract the responses array from the response
+    return response_data.get("responses", [])
+
+
+async def bulk_write_responses(rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Overwrite the responses column of many tickets in one round trip.
+
+    Uses the bulk_set_responses database function (sql/bulk_set_responses.sql); if it
+    has not been installed yet, falls back to one update per ticket.
+
+    Args:
+        rows: {"ticket_number": str, "responses": list} per ticket
+
+    Returns:
+        Set of ticket numbers that were updated
+    """
+    if not rows:
+        return set()
+
+    try:
+        result = await execute_with_retry(get_service_client()
+                                          .rpc("bulk_set_responses", {"records": rows}))
+        return {row["ticket_number"] for row in result.data or []}
+
+    except APIError as e:
+        if e.code != UNDEFINED_FUNCTION_CODE:
+            logger.error(f"Error writing responses for {len(rows)} tickets: {str(e)}")
+            raise
+        logger.warning("bulk_set_responses database function not found, updating tickets one by one")
+
+    updated = set()
+    for row in rows:
+        result = await execute_with_retry(get_service_client()
+                                          .table("project_tickets")
+                                          .update({"responses": row["responses"]})
+                                          .eq("ticket_number", row["ticket_number"]))
+        if result.data:
+            updated.add(row["ticket_number"])
+    return updated
 
 
 async def sync_bluestakes_responses(company_id: Optional[int] = None) -> Dict[str, Any]:
@@ -70,78 +125,105 @@ async def sync_bluestakes_responses(company_id: Optional[int] = None) -> Dict[st
         "total_tickets_updated": 0,
         "total_tickets_failed": 0,
         "companies": {},
-        "errors": []
+        "errors": [],
+        "errors_total": 0
     }
 
     try:
         # Get today's date for comparison
         today = date.today()
+        fetch_slots = asyncio.Semaphore(RESPONSE_FETCH_CONCURRENCY)
 
-        # Build query for active tickets (expires > today)
-        query = (get_service_client()
-                .table("project_tickets")
-                .select("ticket_number, company_id")
-                .gt("expires", today.isoformat()))
-
-        if company_id:
-            query = query.eq("company_id", company_id)
-
-        result = query.execute()
-
-        if not result.data:
-            logger.info("No active tickets found to sync responses")
-            return stats
-
-        # Group tickets by company for efficient credential reuse
-        tickets_by_company: Dict[int, List[str]] = {}
-        for ticket in result.data:
-            ticket_company_id = ticket["company_id"]
-            if ticket_company_id not in tickets_by_company:
-                tickets_by_company[ticket_company_id] = []
-            tickets_by_company[ticket_company_id].append(ticket["ticket_number"])
-
-        logger.info(f"Found {len(result.data)} active tickets across {len(tickets_by_company)} companies")
-
-        # Process tickets grouped by company
-        for ticket_company_id, ticket_numbers in tickets_by_company.items():
-            company_stats = {
+        def company_stats_for(ticket_company_id: int) -> Dict[str, Any]:
+            return stats["companies"].setdefault(ticket_company_id, {
                 "tickets_processed": 0,
                 "tickets_updated": 0,
                 "tickets_failed": 0,
-                "errors": []
-            }
-
-            logger.info(f"Processing {len(ticket_numbers)} tickets for company {ticket_company_id}")
+                "errors": [],
+                "errors_total": 0
+            })
+
+        async def fetch_one(ticket: Dict[str, Any]) -> Optional[List[Any]]:
+            async with fetch_slots:
+                return await fetch_ticket_responses(ticket["ticket_number"], ticket["company_id"])
+
+        # Stream active tickets a page at a time (keyset on id) so memory stays at one
+        # page however many tickets are active, and PostgREST's row cap never truncates the sync
+        last_id = None
+        while True:
+            # Build query for active tickets (expires > today); builders are mutable, so one per page
+            query = (get_service_client()
+                    .table("project_tickets")
+                    .select("id, ticket_number, company_id")
+                    .gt("expires", today.isoformat()))
+
+            if company_id:
+                query = query.eq("company_id", company_id)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+
+            result = await execute_async(query.order("id").limit(RESPONSE_SYNC_PAGE_SIZE))
+            tickets = result.data or []
+            if not tickets:
+                break
+            last_id = tickets[-1]["id"]
+
+            # Fetch the page's responses concurrently; BlueStakes pacing is left to its shared limiter
+            fetched = await asyncio.gather(*(fetch_one(ticket) for ticket in tickets), return_exceptions=True)
+
+            # Responses fetched from BlueStakes, written in bulk RESPONSE_WRITE_BATCH_SIZE tickets at a time
+            pending_rows = []
+            for ticket, responses_array in zip(tickets, fetched):
+                ticket_number = ticket["ticket_number"]
+                company_stats = company_stats_for(ticket["company_id"])
+                stats["total_tickets_processed"] += 1
+                company_stats["tickets_processed"] += 1
+
+                if isinstance(responses_array, Exception):
+                    stats["total_tickets_failed"] += 1
+                    company_stats["tickets_failed"] += 1
+                    error_msg = f"Error processing ticket {ticket_number}: {str(responses_array)}"
+                    record_error(company_stats, error_msg)
+                    record_error(stats, error_msg)
+                    logger.error(error_msg)
+                elif responses_array is None:
+                    stats["total_tickets_failed"] += 1
+                    company_stats["tickets_failed"] += 1
+                    logger.warning("Failed to sync responses for ticket %s", ticket_number)
+                else:
+                    pending_rows.append({"ticket_number": ticket_number, "responses": responses_array})
 
-            for ticket_number in ticket_numbers:
+            companies = {ticket["ticket_number"]: ticket["company_id"] for ticket in tickets}
+            for batch_start in range(0, len(pending_rows), RESPONSE_WRITE_BATCH_SIZE):
+                rows = pending_rows[batch_start:batch_start + RESPONSE_WRITE_BATCH_SIZE]
                 try:
-                    stats["total_tickets_processed"] += 1
-                    company_stats["tickets_processed"] += 1
+                    updated = await bulk_write_responses(rows)
+                except Exception as e:
+                    updated = set()
+                    error_msg = f"Error writing responses for {len(rows)} tickets: {str(e)}"
+                    record_error(stats, error_msg)
+                    logger.error(error_msg)
 
-                    # Sync the ticket responses
-                    if await sync_ticket_responses(ticket_number, ticket_company_id):
+                for row in rows:
+                    ticket_number = row["ticket_number"]
+                    company_stats = company_stats_for(companies[ticket_number])
+                    if ticket_number in updated:
                         stats["total_tickets_updated"] += 1
                         company_stats["tickets_updated"] += 1
-                        logger.info(f"Synced responses for ticket {ticket_number}")
+                        logger.debug("Synced responses for ticket %s", ticket_number)
                     else:
                         stats["total_tickets_failed"] += 1
                         company_stats["tickets_failed"] += 1
-                        logger.warning(f"Failed to sync responses for ticket {ticket_number}")
+                        logger.warning("Failed to sync responses for ticket %s", ticket_number)
 
-                    # Add 100ms delay between tickets for rate limiting
-                    await asyncio.sleep(0.1)
+            if len(tickets) < RESPONSE_SYNC_PAGE_SIZE:
+                break
 
-                except Exception as e:
-                    stats["total_tickets_failed"] += 1
-                    company_stats["tickets_failed"] += 1
-                    error_msg = f"Error processing ticket {ticket_number}: {str(e)}"
-                    company_stats["errors"].append(error_msg)
-                    stats["errors"].append(error_msg)
-                    logger.error(error_msg)
-                    continue
+        if not stats["total_tickets_processed"]:
+            logger.info("No active tickets found to sync responses")
+            return stats
 
-            # Store company stats
-            stats["companies"][ticket_company_id] = company_stats
+        for ticket_company_id, company_stats in stats["companies"].items():
             logger.info(f"Company {ticket_company_id}: {company_stats['tickets_updated']} updated, {company_stats['tickets_failed']} failed")
 
         logger.info(f"Response sync completed: {stats['total_tickets_updated']} updated, {stats['total_tickets_failed']} failed")
@@ -149,6 +231,6 @@ async def sync_bluestakes_responses(company_id: Optional[int] = None) -> Dict[st
 
     except Exception as e:
         error_msg = f"Error in sync_bluestakes_responses: {str(e)}"
-        stats["errors"].append(error_msg)
+        record_error(stats, error_msg)
         logger.error(error_msg)
         return stats
@@ -6,17 +6,73 @@ Consolidates both new ticket insertion, existing ticket updates, and response fe
 """
 import asyncio
 import logging
+import os
+from collections import defaultdict
+from functools import partial
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, List
-from config.supabase_client import get_service_client
+from typing import Dict, Any, List, AsyncIterator, Iterable, Iterator, Optional, Tuple
+from postgrest.exceptions import APIError
+from config.supabase_client import get_service_client, execute_async, execute_with_retry
 from utils.bluestakes import (
     search_bluestakes_tickets,
+    get_ticket_details,
+    get_ticket_responses,
     transform_bluestakes_ticket_to_project_ticket
 )
+from utils.bluestakes_token_manager import get_token_for_company
 from tasks.updatable_tickets import sync_updateable_tickets
+from tasks.job_stats import record_error
 
 logger = logging.getLogger(__name__)
 
+# Page size for the BlueStakes ticket search; every page is fetched, this only
+# bounds how many tickets are held in memory at once
+BLUESTAKES_SEARCH_PAGE_SIZE = 100
+
+# Search pages fetched ahead of the page being processed
+SEARCH_PAGE_PREFETCH = 1
+
+# Maximum rows sent in a single bulk insert request
+BULK_INSERT_CHUNK_SIZE = 500
+
+# Maximum number of companies synced at the same time
+COMPANY_SYNC_CONCURRENCY = int(os.getenv("BLUESTAKES_CONCURRENCY", "8"))
+
+# Maximum number of tickets in a batch fetched from BlueStakes at the same time
+TICKET_DETAILS_CONCURRENCY = 4
+
+# Orphaned tickets fetched per page when linking from Python
+ORPHAN_PAGE_SIZE = 500
+
+# Columns compared by has_ticket_data_changed; the batch lookup fetches only these
+# (leaving out the large bluestakes_data JSON)
+TICKET_COMPARE_COLUMNS = (
+    "ticket_number, place, street, location_description, formatted_address, work_area, "
+    "expires, original_date, replace_by_date, legal_date, done_for, type, "
+    "st_from_address, st_to_address, cross1, cross2, county, state, zip, "
+    "name, phone, email, revision, old_ticket, responses"
+)
+
+# Fields has_ticket_data_changed compares as text and as dates
+TICKET_COMPARE_TEXT_FIELDS = (
+    "place", "street", "location_description", "formatted_address", "done_for", "type",
+    "st_from_address", "st_to_address", "cross1", "cross2", "county", "state", "zip",
+    "name", "phone", "email", "revision", "old_ticket",
+)
+TICKET_COMPARE_DATE_FIELDS = ("expires", "original_date", "replace_by_date", "legal_date")
+
+# Maximum continue-status update requests in flight at once
+CONTINUE_UPDATE_CONCURRENCY = 20
+
+# PostgREST error code returned when an RPC function does not exist
+UNDEFINED_FUNCTION_CODE = "PGRST202"
+
+# PostgREST error codes returned when a table or view does not exist
+UNDEFINED_RELATION_CODES = ("PGRST205", "42P01")
+
+# Cleared once the companies_with_bluestakes view turns out to be missing
+_companies_view_available = True
+
 
 async def sync_bluestakes_tickets(company_id: int = None, days_back: int = 28):
     """
@@ -40,54 +96,61 @@ async def sync_bluestakes_tickets(company_id: int = None, days_back: int = 28):
         "tickets_added": 0,
         "tickets_updated": 0,
         "tickets_skipped": 0,
+        "tickets_failed": 0,
         "tickets_linked": 0,
         "old_tickets_updated": 0,
         "updateable_tickets_checked": 0,
         "updateable_tickets_found": 0,
-        "errors": []
+        "errors": [],
+        "errors_total": 0
     }
     
     try:
         # Step 1: Get companies with BlueStakes credentials
-        if company_id:
-            companies = await get_company_with_bluestakes_credentials(company_id)
-            if not companies:
+        companies = await get_companies_with_bluestakes_credentials(company_id)
+        if not companies:
+            if company_id:
                 logger.warning(f"Company {company_id} not found or has no BlueStakes credentials")
-                return sync_stats
-        else:
-            companies = await get_companies_with_bluestakes_credentials()
-            
-            if not companies:
+            else:
                 logger.warning("No companies found with BlueStakes credentials")
-                return sync_stats
+            return sync_stats
         
         # Step 2: Calculate date range (last N days)
-        end_date = datetime.utcnow()
+        end_date = datetime.now(timezone.utc)
         start_date = end_date - timedelta(days=days_back)
 
         # Format dates for BlueStakes API (MM/DD/YYYY format required)
         search_params = {
             "start": start_date.strftime("%m/%d/%Y"),
             "end": end_date.strftime("%m/%d/%Y"),
-            "limit": 100  # Reasonable limit per company
+            "limit": BLUESTAKES_SEARCH_PAGE_SIZE
         }
         
-        # Step 3: Process each company
-        for company in companies:
-            try:
-                company_stats = await sync_company_tickets(company, search_params)
-                sync_stats["companies_processed"] += 1
-                sync_stats["tickets_added"] += company_stats["tickets_added"]
-                sync_stats["tickets_updated"] += company_stats["tickets_updated"]
-                sync_stats["tickets_skipped"] += company_stats["tickets_skipped"]
+        # Step 3: Process companies concurrently (bounded to respect BlueStakes rate limits)
+        semaphore = asyncio.Semaphore(COMPANY_SYNC_CONCURRENCY)
 
-            except Exception as e:
+        async def sync_company(company: Dict[str, Any]) -> Dict[str, int]:
+            async with semaphore:
+                return await sync_company_tickets(company, search_params)
+
+        results = await asyncio.gather(
+            *(sync_company(company) for company in companies),
+            return_exceptions=True
+        )
+
+        for company, company_stats in zip(companies, results):
+            if isinstance(company_stats, Exception):
                 sync_stats["companies_failed"] += 1
-                error_msg = f"Failed to sync company {company['id']} ({company['name']}): {str(e)}"
-                sync_stats["errors"].append(error_msg)
+                error_msg = f"Failed to sync company {company['id']} ({company['name']}): {str(company_stats)}"
+                record_error(sync_stats, error_msg)
                 logger.error(error_msg)
-                # Continue with next company
                 continue
+
+            sync_stats["companies_processed"] += 1
+            sync_stats["tickets_added"] += company_stats["tickets_added"]
+            sync_stats["tickets_updated"] += company_stats["tickets_updated"]
+            sync_stats["tickets_skipped"] += company_stats["tickets_skipped"]
+            sync_stats["tickets_failed"] += company_stats["tickets_failed"]
         
         # Step 4: Link orphaned tickets to projects based on old_ticket relationships
         try:
@@ -107,6 +170,7 @@ async def sync_bluestakes_tickets(company_id: int = None, days_back: int = 28):
                    f"Tickets: {sync_stats['tickets_added']} added, "
                    f"{sync_stats['tickets_updated']} updated, "
                    f"{sync_stats['tickets_skipped']} skipped, "
+                   f"{sync_stats['tickets_failed']} failed, "
                    f"{sync_stats.get('tickets_linked', 0)} linked to projects, "
                    f"{sync_stats.get('old_tickets_updated', 0)} old tickets updated.")
 
@@ -122,174 +186,174 @@ async def sync_bluestakes_tickets(company_id: int = None, days_back: int = 28):
             logger.error(f"Error syncing updateable tickets: {str(e)}")
             sync_stats["updateable_tickets_checked"] = 0
             sync_stats["updateable_tickets_found"] = 0
-            sync_stats["errors"].append(f"Updateable tickets sync error: {str(e)}")
+            record_error(sync_stats, f"Updateable tickets sync error: {str(e)}")
 
         # Note: Responses are now fetched inline with ticket data during main sync
         # No separate response sync step needed
 
-        # Send webhook notification with results
-        # TODO: Uncomment when mitchellhub.org webhook server is back online
-        # webhook_url = "https://n8n.mitchellhub.org/webhook/171d82c9-2e36-4b1c-9ca8-211fcf9ebaaf"
-        # webhook_data = {
-        #     "job_type": "daily_bluestakes_sync",
-        #     "timestamp": datetime.utcnow().isoformat(),
-        #     "status": "completed",
-        #     "results": sync_stats,
-        #     "summary": {
-        #         "companies_processed": sync_stats['companies_processed'],
-        #         "companies_failed": sync_stats['companies_failed'],
-        #         "tickets_added": sync_stats['tickets_added'],
-        #         "tickets_updated": sync_stats['tickets_updated'],
-        #         "tickets_skipped": sync_stats['tickets_skipped'],
-        #         "tickets_linked": sync_stats.get('tickets_linked', 0),
-        #         "old_tickets_updated": sync_stats.get('old_tickets_updated', 0),
-        #         "updateable_tickets_checked": sync_stats.get('updateable_tickets_checked', 0),
-        #         "updateable_tickets_found": sync_stats.get('updateable_tickets_found', 0),
-        #         "total_errors": len(sync_stats.get('errors', []))
-        #     }
-        # }
-        #
-        # # Send webhook (don't fail the job if webhook fails)
-        # try:
-        #     webhook_success = await send_webhook(webhook_url, webhook_data)
-        #     if webhook_success:
-        #         logger.info("Webhook notification sent successfully")
-        #     else:
-        #         logger.warning("Failed to send webhook notification")
-        # except Exception as e:
-        #     logger.error(f"Error sending webhook notification: {str(e)}")
-
-        logger.info("Webhook notifications temporarily disabled - mitchellhub.org server down")
-
         return sync_stats
         
     except Exception as e:
         logger.error(f"Critical error in BlueStakes sync job: {str(e)}")
-        sync_stats["errors"].append(f"Critical error: {str(e)}")
-        
-        # Send webhook notification for failed job
-        # TODO: Uncomment when mitchellhub.org webhook server is back online
-        # webhook_url = "https://n8n.mitchellhub.org/webhook/171d82c9-2e36-4b1c-9ca8-211fcf9ebaaf"
-        # webhook_data = {
-        #     "job_type": "daily_bluestakes_sync",
-        #     "timestamp": datetime.utcnow().isoformat(),
-        #     "status": "failed",
-        #     "error": str(e),
-        #     "results": sync_stats,
-        #     "summary": {
-        #         "companies_processed": sync_stats['companies_processed'],
-        #         "companies_failed": sync_stats['companies_failed'],
-        #         "tickets_added": sync_stats['tickets_added'],
-        #         "tickets_skipped": sync_stats['tickets_skipped'],
-        #         "tickets_linked": sync_stats.get('tickets_linked', 0),
-        #         "old_tickets_updated": sync_stats.get('old_tickets_updated', 0),
-        #         "total_errors": len(sync_stats.get('errors', []))
-        #     }
-        # }
-        # 
-        # # Send webhook (don't fail further if webhook fails)
-        # try:
-        #     await send_webhook(webhook_url, webhook_data)
-        #     logger.info("Error webhook notification sent")
-        # except Exception as webhook_error:
-        #     logger.error(f"Failed to send error webhook: {str(webhook_error)}")
-        
-        logger.info("Error webhook notifications temporarily disabled - mitchellhub.org server down")
-        
+        record_error(sync_stats, f"Critical error: {str(e)}")
         raise
 
 
-async def get_companies_with_bluestakes_credentials() -> List[Dict[str, Any]]:
+async def get_companies_with_bluestakes_credentials(company_id: int = None) -> List[Dict[str, Any]]:
     """
-    Fetch all companies that have BlueStakes credentials configured.
+    Fetch companies that have BlueStakes credentials configured.
+
+    Reads the companies_with_bluestakes view (sql/create_companies_with_bluestakes_view.sql),
+    which holds the credential filter; until that view is created the same filter
+    is applied to the companies table here.
+
+    Args:
+        company_id: If provided, only this company is returned (when it has credentials)
+
+    Returns:
+        List of company rows (id, name, bluestakes_username, bluestakes_password)
     """
+    global _companies_view_available
     try:
-        result = (get_service_client()
+        client = get_service_client()
+        if _companies_view_available:
+            query = client.table("companies_with_bluestakes").select("*")
+            if company_id:
+                query = query.eq("id", company_id)
+            try:
+                result = await execute_async(query)
+                return result.data if result.data else []
+            except APIError as e:
+                if e.code not in UNDEFINED_RELATION_CODES:
+                    raise
+                logger.warning("companies_with_bluestakes view not found, filtering companies directly")
+                _companies_view_available = False
+
+        query = (client
                  .schema("public")
                  .table("companies")
                  .select("id, name, bluestakes_username, bluestakes_password")
                  .not_.is_("bluestakes_username", "null")
                  .not_.is_("bluestakes_password", "null")
                  .neq("bluestakes_username", "")
-                 .neq("bluestakes_password", "")
-                 .execute())
+                 .neq("bluestakes_password", ""))
+
+        if company_id:
+            query = query.eq("id", company_id)
+
+        result = await execute_async(query)
         
         return result.data if result.data else []
         
     except Exception as e:
-        logger.error(f"Error fetching companies with BlueStakes credentials: {str(e)}")
+        if company_id:
+            logger.error(f"Error fetching company {company_id} with BlueStakes credentials: {str(e)}")
+        else:
+            logger.error(f"Error fetching companies with BlueStakes credentials: {str(e)}")
         raise
 
 
 async def get_company_with_bluestakes_credentials(company_id: int) -> List[Dict[str, Any]]:
     """
     Fetch a specific company with BlueStakes credentials configured.
-    Returns as a list to maintain consistency with get_companies_with_bluestakes_credentials.
+    (Legacy function - use get_companies_with_bluestakes_credentials(company_id))
     """
-    try:
-        result = (get_service_client()
-                 .schema("public")
-                 .table("companies")
-                 .select("id, name, bluestakes_username, bluestakes_password")
-                 .eq("id", company_id)
-                 .not_.is_("bluestakes_username", "null")
-                 .not_.is_("bluestakes_password", "null")
-                 .neq("bluestakes_username", "")
-                 .neq("bluestakes_password", "")
-                 .execute())
-        
-        return result.data if result.data else []
-        
-    except Exception as e:
-        logger.error(f"Error fetching company {company_id} with BlueStakes credentials: {str(e)}")
-        raise
+    return await get_companies_with_bluestakes_credentials(company_id)
 
 
 async def sync_company_tickets(company: Dict[str, Any], search_params: Dict[str, Any]) -> Dict[str, int]:
     """
     Sync tickets for a single company with pagination support.
-    Continues fetching until fewer than `limit` tickets are returned.
+    Pages are fetched by a producer task while the consumer processes the
+    previous page, and the bounded queue keeps at most SEARCH_PAGE_PREFETCH
+    pages waiting, so memory stays at a few pages of tickets.
     Handles both new ticket insertion and existing ticket updates.
     """
-    company_stats = {"tickets_added": 0, "tickets_updated": 0, "tickets_skipped": 0}
+    company_stats = {"tickets_added": 0, "tickets_updated": 0, "tickets_skipped": 0, "tickets_failed": 0}
     company_id = company["id"]
 
-    # Step 1: Paginate through all tickets
-    limit = search_params.get("limit", 100)
+    # Items are pages, then None when the search is exhausted (or the exception that stopped it)
+    pages: asyncio.Queue = asyncio.Queue(maxsize=SEARCH_PAGE_PREFETCH)
+
+    async def fetch_pages():
+        try:
+            async for tickets_data in _iter_ticket_pages(company_id, search_params):
+                await pages.put(tickets_data)
+        except Exception as e:
+            await pages.put(e)
+            return
+        await pages.put(None)
+
+    producer = asyncio.create_task(fetch_pages())
+    try:
+        while True:
+            tickets_data = await pages.get()
+            if tickets_data is None:
+                break
+            if isinstance(tickets_data, Exception):
+                raise tickets_data
+
+            batch_stats = await _process_ticket_batch(tickets_data, company_id)
+            company_stats["tickets_added"] += batch_stats["tickets_added"]
+            company_stats["tickets_updated"] += batch_stats["tickets_updated"]
+            company_stats["tickets_skipped"] += batch_stats["tickets_skipped"]
+            company_stats["tickets_failed"] += batch_stats["tickets_failed"]
+    finally:
+        # Stops the producer if processing failed (no-op once it has finished)
+        producer.cancel()
+
+    logger.info(f"Finished syncing company {company_id}: {company_stats['tickets_added']} added, "
+                f"{company_stats['tickets_updated']} updated, {company_stats['tickets_skipped']} skipped, "
+                f"{company_stats['tickets_failed']} failed")
+    return company_stats
+
+
+async def _iter_ticket_pages(company_id: int, search_params: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of tickets from the BlueStakes search endpoint.
+
+    Pages through the search with `offset` until a short or empty page is
+    returned, so companies with more than one page of tickets are fully synced.
+    Stops early if the API hands back the same page twice (offset ignored)
+    rather than looping forever.
+
+    Args:
+        company_id: Company ID for token caching and credential lookup
+        search_params: Base search parameters; `limit` is the page size
+    """
+    limit = search_params.get("limit") or BLUESTAKES_SEARCH_PAGE_SIZE
     offset = 0
+    previous_first_ticket = None
 
     while True:
-        # Build paginated search params
-        paginated_params = {**search_params, "offset": offset}
+        paginated_params = {**search_params, "limit": limit, "offset": offset}
 
-        logger.info(f"Fetching tickets for company {company_id} with offset {offset}, limit {limit}")
+        logger.debug("Fetching tickets for company %s with offset %s, limit %s", company_id, offset, limit)
 
         # Search for tickets (uses cached token + auto-retry internally)
-        bluestakes_response = await search_bluestakes_tickets(
-            paginated_params,
-            company_id
-        )
-
-        # Extract tickets from response
-        tickets_data = _extract_tickets_from_response(bluestakes_response)
+        bluestakes_response = await search_bluestakes_tickets(paginated_params, company_id)
+        tickets_data = list(_iter_tickets_from_response(bluestakes_response))
 
         if not tickets_data:
             logger.info(f"No more tickets found for company {company_id} at offset {offset}")
-            break
+            return
+
+        first_ticket = tickets_data[0].get("ticket")
+        if offset and first_ticket is not None and first_ticket == previous_first_ticket:
+            logger.warning(f"BlueStakes returned the same page twice for company {company_id} "
+                           f"at offset {offset}, stopping pagination")
+            return
+        previous_first_ticket = first_ticket
 
         tickets_fetched = len(tickets_data)
-        logger.info(f"Fetched {tickets_fetched} tickets for company {company_id} at offset {offset}")
+        logger.debug("Fetched %s tickets for company %s at offset %s", tickets_fetched, company_id, offset)
 
-        # Process this batch of tickets
-        batch_stats = await _process_ticket_batch(tickets_data, company_id)
-        company_stats["tickets_added"] += batch_stats["tickets_added"]
-        company_stats["tickets_updated"] += batch_stats["tickets_updated"]
-        company_stats["tickets_skipped"] += batch_stats["tickets_skipped"]
+        yield tickets_data
 
         # If we got fewer tickets than the limit, we've reached the end
         if tickets_fetched < limit:
             logger.info(f"Reached end of tickets for company {company_id} (got {tickets_fetched} < {limit})")
-            break
+            return
 
         # Move to next page
         offset += limit
@@ -297,30 +361,30 @@ async def sync_company_tickets(company: Dict[str, Any], search_params: Dict[str,
         # Small delay between pages to be respectful to the API
         await asyncio.sleep(0.5)
 
-    logger.info(f"Finished syncing company {company_id}: {company_stats['tickets_added']} added, "
-                f"{company_stats['tickets_updated']} updated, {company_stats['tickets_skipped']} skipped")
-    return company_stats
-
 
-def _extract_tickets_from_response(bluestakes_response) -> List[Dict[str, Any]]:
+def _iter_tickets_from_response(bluestakes_response) -> Iterator[Dict[str, Any]]:
     """
-    Extract ticket data from various response formats.
-    """
-    tickets_data = []
+    Yield ticket dicts from either BlueStakes search response shape.
 
+    Handles a list of {"data": [...]} pages as well as a single {"data": [...]}
+    dict; anything that is not a ticket dict is dropped.
+    """
     if isinstance(bluestakes_response, list):
-        for response_item in bluestakes_response:
-            if isinstance(response_item, dict) and "data" in response_item:
-                tickets_data.extend(response_item.get("data", []))
+        pages = bluestakes_response
     elif isinstance(bluestakes_response, dict):
-        if "data" in bluestakes_response:
-            tickets_data = bluestakes_response.get("data", [])
-        else:
-            logger.warning(f"Dict response does not contain 'data' key. Available keys: {list(bluestakes_response.keys())}")
+        if "data" not in bluestakes_response:
+            logger.warning("BlueStakes search response does not contain a 'data' key")
+        pages = (bluestakes_response,)
     else:
         logger.warning(f"Unexpected response type: {type(bluestakes_response)}")
+        return
 
-    return tickets_data
+    for page in pages:
+        if not isinstance(page, dict):
+            continue
+        for ticket_data in page.get("data") or ():
+            if isinstance(ticket_data, dict):
+                yield ticket_data
 
 
 async def _process_ticket_batch(tickets_data: List[Dict[str, Any]], company_id: int, max_age_hours: int = 24) -> Dict[str, int]:
@@ -333,82 +397,144 @@ async def _process_ticket_batch(tickets_data: List[Dict[str, Any]], company_id:
         company_id: Company ID for authentication
         max_age_hours: Maximum age in hours before update is needed (default 24)
     """
-    from utils.bluestakes import get_ticket_details
-    from utils.bluestakes_token_manager import get_token_for_company
+    batch_stats = {"tickets_added": 0, "tickets_updated": 0, "tickets_skipped": 0, "tickets_failed": 0}
 
-    batch_stats = {"tickets_added": 0, "tickets_updated": 0, "tickets_skipped": 0}
+    # Every ticket in the batch belongs to the same company and shares one timestamp - bind them once
+    transform = partial(transform_bluestakes_ticket_to_project_ticket,
+                        company_id=company_id, now=datetime.now(timezone.utc))
 
     # Get cached token for this company (used for get_ticket_details calls)
     token = await get_token_for_company(company_id)
 
+    # A page can repeat a ticket; keep the last copy so each ticket is fetched and written once
+    unique_tickets = {}
     for ticket_data in tickets_data:
-        if not isinstance(ticket_data, dict):
-            continue
-
-        ticket_number = ticket_data.get("ticket")
-
+        ticket_number = ticket_data.get("ticket") if isinstance(ticket_data, dict) else None
         if not ticket_number:
-            logger.warning(f"Ticket missing ticket number, skipping: {ticket_data}")
+            logger.warning("Ticket missing ticket number, skipping: %s", ticket_data)
             continue
+        unique_tickets[ticket_number.strip()] = ticket_data
 
-        # Check if ticket exists and get current data
-        sync_status = await get_existing_ticket_sync_status(ticket_number, max_age_hours)
-
-        # Fetch full ticket details and transform (we need this for both new and existing)
-        try:
-            full_ticket_data = await get_ticket_details(token, ticket_number)
+    # Fetch the stored rows for the whole batch in one query instead of one per ticket
+    existing_tickets = await get_existing_tickets_data(list(unique_tickets))
 
-            # Use full ticket data if available, otherwise fall back to basic data
-            if full_ticket_data and not full_ticket_data.get("error"):
-                project_ticket = transform_bluestakes_ticket_to_project_ticket(
-                    full_ticket_data, company_id
-                )
-            else:
-                project_ticket = transform_bluestakes_ticket_to_project_ticket(
-                    ticket_data, company_id
-                )
+    # Tickets are fetched concurrently (bounded); pacing against BlueStakes is left to the
+    # shared adaptive limiter in utils/bluestakes.py
+    semaphore = asyncio.Semaphore(TICKET_DETAILS_CONCURRENCY)
 
-            # Fetch responses data for this ticket
+    async def process_ticket(ticket_number: str, ticket_data: Dict[str, Any]):
+        async with semaphore:
             try:
-                from utils.bluestakes import get_ticket_responses
-                responses_data = await get_ticket_responses(ticket_number, company_id)
-                # Extract the responses array from the response
-                responses_array = responses_data.get("responses", []) if responses_data else []
-                project_ticket.responses = responses_array
+                return await _fetch_and_apply_ticket(ticket_number, ticket_data, existing_tickets.get(ticket_number),
+                                                     token, company_id, transform)
             except Exception as e:
-                logger.warning(f"Could not fetch responses for ticket {ticket_number}: {str(e)}")
-                project_ticket.responses = []
-
-            # Insert or update based on existence and data changes
-            if sync_status["exists"]:
-                # Ticket exists - check if data has changed
-                if has_ticket_data_changed(sync_status["data"], project_ticket):
-                    await update_project_ticket(project_ticket)
-                    batch_stats["tickets_updated"] += 1
-                    logger.info(f"Updated ticket {ticket_number} - data changed")
-                else:
-                    batch_stats["tickets_skipped"] += 1
-                    logger.debug(f"Skipping ticket {ticket_number} - no changes detected")
-            else:
-                # New ticket - insert
-                await insert_project_ticket(project_ticket)
-                batch_stats["tickets_added"] += 1
-                logger.debug(f"Inserted new ticket {ticket_number}")
+                logger.error("Error processing ticket %s: %s", ticket_number, e)
+                return None
 
-            # Add small delay to respect API rate limits
-            await asyncio.sleep(0.1)
+    results = await asyncio.gather(
+        *(process_ticket(ticket_number, ticket_data) for ticket_number, ticket_data in unique_tickets.items())
+    )
+
+    # New tickets are collected and written with one bulk insert
+    new_tickets = []
+    for result in results:
+        if result == "updated":
+            batch_stats["tickets_updated"] += 1
+        elif result == "skipped":
+            batch_stats["tickets_skipped"] += 1
+        elif result is None:
+            batch_stats["tickets_failed"] += 1
+        else:
+            new_tickets.append(result)
 
-        except Exception as e:
-            logger.error(f"Error processing ticket {ticket_number}: {str(e)}")
-            continue
+    if new_tickets:
+        batch_stats["tickets_added"], insert_failures = await bulk_insert_project_tickets(new_tickets)
+        batch_stats["tickets_failed"] += insert_failures
+        logger.info(f"Inserted {batch_stats['tickets_added']} new tickets for company {company_id}")
 
     return batch_stats
 
 
+async def _fetch_and_apply_ticket(ticket_number: str, ticket_data: Dict[str, Any], existing_data,
+                                  token: str, company_id: int, transform):
+    """
+    Fetch a ticket's full details and responses, then update it if it changed.
+
+    Args:
+        ticket_number: Ticket number
+        ticket_data: Basic ticket data from the search (used if details can't be fetched)
+        existing_data: Stored row for change comparison, or None for a new ticket
+        token: BlueStakes token for the company
+        company_id: Company ID
+        transform: transform_bluestakes_ticket_to_project_ticket bound to the batch
+
+    Returns:
+        "updated" or "skipped" for existing tickets, or the ProjectTicketCreate to insert
+    """
+    # Fetch full ticket details and transform (we need this for both new and existing)
+    full_ticket_data = await get_ticket_details(token, ticket_number)
+
+    # Use full ticket data if available, otherwise fall back to basic data
+    if full_ticket_data and not full_ticket_data.get("error"):
+        project_ticket = transform(full_ticket_data)
+    else:
+        project_ticket = transform(ticket_data)
+
+    # Fetch responses data for this ticket
+    try:
+        responses_data = await get_ticket_responses(ticket_number, company_id)
+        # Extract the responses array from the response
+        responses_array = responses_data.get("responses", []) if responses_data else []
+        project_ticket.responses = responses_array
+    except Exception as e:
+        logger.warning("Could not fetch responses for ticket %s: %s", ticket_number, e)
+        project_ticket.responses = []
+
+    # New ticket - returned for the bulk insert
+    if existing_data is None:
+        return project_ticket
+
+    # Ticket exists - check if data has changed
+    if has_ticket_data_changed(existing_data, project_ticket):
+        await update_project_ticket(project_ticket, existing_data)
+        logger.debug("Updated ticket %s - data changed", ticket_number)
+        return "updated"
+
+    logger.debug("Skipping ticket %s - no changes detected", ticket_number)
+    return "skipped"
+
+
+def _normalize_compare_value(val):
+    """Normalize a text value for change comparison (blank and None are equal, whitespace ignored)."""
+    if val is None or val == "":
+        return None
+    if isinstance(val, str):
+        return val.strip()
+    return val
+
+
+def _dates_equal(db_val, new_val) -> bool:
+    """Compare a stored date string with a parsed datetime by calendar date."""
+    if db_val is None and new_val is None:
+        return True
+    if db_val is None or new_val is None:
+        return False
+    # Convert new_val datetime to date string for comparison
+    if hasattr(new_val, 'date'):
+        new_val = new_val.date().isoformat()
+    elif hasattr(new_val, 'isoformat'):
+        new_val = new_val.isoformat()
+    return str(db_val) == str(new_val)
+
+
 def has_ticket_data_changed(existing_data: Dict[str, Any], new_project_ticket) -> bool:
     """
     Compare existing ticket data with new data to detect changes.
 
+    Stops at the first difference; the cheap text fields are checked before the
+    work_area and responses JSON.
+    Note: is_continue_update is intentionally NOT compared to preserve user settings.
+
     Args:
         existing_data: Current ticket data from database
         new_project_ticket: New ProjectTicketCreate object from API
@@ -417,71 +543,21 @@ def has_ticket_data_changed(existing_data: Dict[str, Any], new_project_ticket) -
         True if data has changed and update is needed, False otherwise
     """
     try:
-        # Helper to normalize values for comparison
-        def normalize(val):
-            if val is None or val == "":
-                return None
-            if isinstance(val, str):
-                return val.strip()
-            return val
+        get = existing_data.get
 
-        # Helper to compare date values
-        def dates_equal(db_val, new_val):
-            if db_val is None and new_val is None:
+        for field in TICKET_COMPARE_TEXT_FIELDS:
+            if _normalize_compare_value(get(field)) != _normalize_compare_value(getattr(new_project_ticket, field)):
                 return True
-            if db_val is None or new_val is None:
-                return False
-            # Convert new_val datetime to date string for comparison
-            if hasattr(new_val, 'date'):
-                new_val = new_val.date().isoformat()
-            elif hasattr(new_val, 'isoformat'):
-                new_val = new_val.isoformat()
-            return str(db_val) == str(new_val)
-
-        # Check all the fields that matter for ticket data
-        checks = [
-            # Location & Maps
-            normalize(existing_data.get("place")) != normalize(new_project_ticket.place),
-            normalize(existing_data.get("street")) != normalize(new_project_ticket.street),
-            normalize(existing_data.get("location_description")) != normalize(new_project_ticket.location_description),
-            normalize(existing_data.get("formatted_address")) != normalize(new_project_ticket.formatted_address),
-            existing_data.get("work_area") != new_project_ticket.work_area,
-
-            # Dates
-            not dates_equal(existing_data.get("expires"), new_project_ticket.expires),
-            not dates_equal(existing_data.get("original_date"), new_project_ticket.original_date),
-            not dates_equal(existing_data.get("replace_by_date"), new_project_ticket.replace_by_date),
-            not dates_equal(existing_data.get("legal_date"), new_project_ticket.legal_date),
 
-            # Work Details
-            normalize(existing_data.get("done_for")) != normalize(new_project_ticket.done_for),
-            normalize(existing_data.get("type")) != normalize(new_project_ticket.type),
-
-            # Address
-            normalize(existing_data.get("st_from_address")) != normalize(new_project_ticket.st_from_address),
-            normalize(existing_data.get("st_to_address")) != normalize(new_project_ticket.st_to_address),
-            normalize(existing_data.get("cross1")) != normalize(new_project_ticket.cross1),
-            normalize(existing_data.get("cross2")) != normalize(new_project_ticket.cross2),
-            normalize(existing_data.get("county")) != normalize(new_project_ticket.county),
-            normalize(existing_data.get("state")) != normalize(new_project_ticket.state),
-            normalize(existing_data.get("zip")) != normalize(new_project_ticket.zip),
-
-            # Contact
-            normalize(existing_data.get("name")) != normalize(new_project_ticket.name),
-            normalize(existing_data.get("phone")) != normalize(new_project_ticket.phone),
-            normalize(existing_data.get("email")) != normalize(new_project_ticket.email),
-
-            # Ticket Management
-            normalize(existing_data.get("revision")) != normalize(new_project_ticket.revision),
-            normalize(existing_data.get("old_ticket")) != normalize(new_project_ticket.old_ticket),
-            # Note: is_continue_update is intentionally NOT compared to preserve user settings
+        for field in TICKET_COMPARE_DATE_FIELDS:
+            if not _dates_equal(get(field), getattr(new_project_ticket, field)):
+                return True
 
-            # Responses (check if responses have changed)
-            existing_data.get("responses") != getattr(new_project_ticket, "responses", None),
-        ]
+        if get("work_area") != new_project_ticket.work_area:
+            return True
 
-        # Return True if any field has changed
-        return any(checks)
+        # Responses (check if responses have changed)
+        return get("responses") != getattr(new_project_ticket, "responses", None)
 
     except Exception as e:
         logger.error(f"Error comparing ticket data: {str(e)}")
@@ -500,12 +576,11 @@ async def get_existing_ticket_data(ticket_number: str) -> Dict[str, Any]:
         Dict with ticket data or empty dict if not found
     """
     try:
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .select("*")
-                 .eq("ticket_number", ticket_number)
-                 .limit(1)
-                 .execute())
+        result = await execute_async(get_service_client()
+                                     .table("project_tickets")
+                                     .select("*")
+                                     .eq("ticket_number", ticket_number)
+                                     .limit(1))
 
         if not result.data:
             return {}
@@ -517,6 +592,35 @@ async def get_existing_ticket_data(ticket_number: str) -> Dict[str, Any]:
         return {}
 
 
+async def get_existing_tickets_data(ticket_numbers: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch existing ticket data for many tickets with a single IN query.
+
+    Only the columns compared by has_ticket_data_changed are selected.
+
+    Args:
+        ticket_numbers: Ticket numbers to look up (surrounding whitespace is ignored)
+
+    Returns:
+        Dict mapping ticket_number to its stored row; tickets not in the database are absent
+    """
+    numbers = list({ticket_number.strip() for ticket_number in ticket_numbers if ticket_number})
+    if not numbers:
+        return {}
+
+    try:
+        result = await execute_async(get_service_client()
+                                     .table("project_tickets")
+                                     .select(TICKET_COMPARE_COLUMNS)
+                                     .in_("ticket_number", numbers))
+
+        return {row["ticket_number"]: row for row in result.data or []}
+
+    except Exception as e:
+        logger.error(f"Error fetching existing ticket data for {len(numbers)} tickets: {str(e)}")
+        raise
+
+
 async def get_existing_ticket_sync_status(ticket_number: str, max_age_hours: int = 24) -> Dict[str, Any]:
     """
     Check if a ticket exists and fetch its data for change comparison.
@@ -548,70 +652,104 @@ async def get_existing_ticket_sync_status(ticket_number: str, max_age_hours: int
 async def ticket_exists(ticket_number: str) -> bool:
     """
     Check if a ticket already exists in the database.
-    (Legacy function - use get_existing_ticket_sync_status for more details)
+    (Legacy function - the sync no longer probes tickets one at a time: it looks up a
+    whole batch with get_existing_tickets_data and inserts through an upsert that
+    ignores existing ticket numbers)
+
+    Only the id of at most one matching row is fetched.
     """
-    status = await get_existing_ticket_sync_status(ticket_number)
-    return status["exists"]
+    try:
+        result = await execute_async(get_service_client()
+                                     .table("project_tickets")
+                                     .select("id")
+                                     .eq("ticket_number", ticket_number.strip())
+                                     .limit(1))
 
+        return bool(result.data)
 
-async def insert_project_ticket(project_ticket) -> bool:
+    except Exception as e:
+        logger.error(f"Error checking if ticket {ticket_number} exists: {str(e)}")
+        return False
+
+
+def build_project_ticket_rows(project_tickets) -> List[Dict[str, Any]]:
     """
-    Insert a project ticket into the database with all Bluestakes data fields.
+    Serialize ProjectTicketCreate objects into project_tickets insert rows.
+
+    Built as a single comprehension so a whole batch is serialized in one pass.
+
+    Args:
+        project_tickets: Iterable of ProjectTicketCreate objects
+
+    Returns:
+        List of row dicts ready for a PostgREST insert
     """
-    try:
-        insert_data = {
-            "project_id": project_ticket.project_id,
-            "ticket_number": project_ticket.ticket_number,
-            "replace_by_date": project_ticket.replace_by_date.isoformat(),
-            "old_ticket": project_ticket.old_ticket,
-            "is_continue_update": project_ticket.is_continue_update,
-            "legal_date": project_ticket.legal_date.isoformat() if project_ticket.legal_date else None,
-            "company_id": project_ticket.company_id,
-            
+    return [
+        {
+            "project_id": p.project_id,
+            "ticket_number": p.ticket_number,
+            "replace_by_date": p.replace_by_date.isoformat(),
+            "old_ticket": p.old_ticket,
+            "is_continue_update": p.is_continue_update,
+            "legal_date": p.legal_date.isoformat() if p.legal_date else None,
+            "company_id": p.company_id,
+
             # Location & Maps
-            "place": project_ticket.place,
-            "street": project_ticket.street,
-            "location_description": project_ticket.location_description,
-            "formatted_address": project_ticket.formatted_address,
-            "work_area": project_ticket.work_area,
+            "place": p.place,
+            "street": p.street,
+            "location_description": p.location_description,
+            "formatted_address": p.formatted_address,
+            "work_area": p.work_area,
 
             # Date Fields (convert to date strings for PostgreSQL DATE fields)
-            "expires": project_ticket.expires.date().isoformat() if project_ticket.expires else None,
-            "original_date": project_ticket.original_date.date().isoformat() if project_ticket.original_date else None,
+            "expires": p.expires.date().isoformat() if p.expires else None,
+            "original_date": p.original_date.date().isoformat() if p.original_date else None,
 
             # Work Details
-            "done_for": project_ticket.done_for,
-            "type": project_ticket.type,
-            
+            "done_for": p.done_for,
+            "type": p.type,
+
             # Address Details
-            "st_from_address": project_ticket.st_from_address,
-            "st_to_address": project_ticket.st_to_address,
-            "cross1": project_ticket.cross1,
-            "cross2": project_ticket.cross2,
-            "county": project_ticket.county,
-            "state": project_ticket.state,
-            "zip": project_ticket.zip,
-            
+            "st_from_address": p.st_from_address,
+            "st_to_address": p.st_to_address,
+            "cross1": p.cross1,
+            "cross2": p.cross2,
+            "county": p.county,
+            "state": p.state,
+            "zip": p.zip,
+
             # Contact Information
-            "name": project_ticket.name,
-            "phone": project_ticket.phone,
-            "email": project_ticket.email,
-            
+            "name": p.name,
+            "phone": p.phone,
+            "email": p.email,
+
             # Ticket Management
-            "revision": project_ticket.revision,
-            
+            "revision": p.revision,
+
             # Metadata
-            "bluestakes_data_updated_at": project_ticket.bluestakes_data_updated_at.isoformat() if project_ticket.bluestakes_data_updated_at else None,
-            "bluestakes_data": project_ticket.bluestakes_data,
+            "bluestakes_data_updated_at": p.bluestakes_data_updated_at.isoformat() if p.bluestakes_data_updated_at else None,
+            "bluestakes_data": p.bluestakes_data,
 
             # Responses from utility companies
-            "responses": project_ticket.responses if hasattr(project_ticket, 'responses') else []
+            "responses": getattr(p, "responses", [])
         }
+        for p in project_tickets
+    ]
+
 
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .insert(insert_data)
-                 .execute())
+async def insert_project_ticket(project_ticket) -> bool:
+    """
+    Insert a project ticket into the database with all Bluestakes data fields.
+
+    Written as an upsert that ignores an existing ticket_number, so a retry after
+    a transient failure cannot create a duplicate row.
+    """
+    try:
+        insert_data = build_project_ticket_rows([project_ticket])[0]
+
+        result = await execute_with_retry(get_service_client()
+                                          .table("project_tickets")
+                                          .upsert(insert_data, on_conflict="ticket_number", ignore_duplicates=True))
         
         return bool(result.data)
         
@@ -620,10 +758,65 @@ async def insert_project_ticket(project_ticket) -> bool:
         raise
 
 
-async def update_project_ticket(project_ticket) -> bool:
+async def bulk_insert_project_tickets(project_tickets, chunk_size: int = BULK_INSERT_CHUNK_SIZE) -> Tuple[int, int]:
+    """
+    Insert many project tickets with one request per chunk of rows.
+
+    Uses the same ignore-duplicates upsert as insert_project_ticket, so chunks
+    can be retried safely after transient failures. If a chunk still fails (e.g.
+    one bad row), its tickets are inserted one at a time with insert_project_ticket
+    so the rest of the chunk is not lost.
+
+    Args:
+        project_tickets: List of ProjectTicketCreate objects
+        chunk_size: Maximum number of rows sent per request
+
+    Returns:
+        Tuple of (rows actually inserted, tickets that could not be inserted)
+    """
+    # Drop duplicate ticket numbers (the last copy wins) so each row is sent once
+    tickets = list({p.ticket_number: p for p in project_tickets}.values())
+    rows = build_project_ticket_rows(tickets)
+    inserted = 0
+    failed = 0
+
+    for start in range(0, len(rows), chunk_size):
+        try:
+            result = await execute_with_retry(get_service_client()
+                                              .table("project_tickets")
+                                              .upsert(rows[start:start + chunk_size],
+                                                      on_conflict="ticket_number",
+                                                      ignore_duplicates=True))
+            inserted += len(result.data) if result.data else 0
+            continue
+
+        except Exception as e:
+            chunk = tickets[start:start + chunk_size]
+            logger.error(f"Error bulk inserting {len(chunk)} project tickets, inserting them one by one: {str(e)}")
+
+        for project_ticket in chunk:
+            try:
+                if await insert_project_ticket(project_ticket):
+                    inserted += 1
+            except Exception:
+                # insert_project_ticket has already logged the error
+                failed += 1
+
+    return inserted, failed
+
+
+async def update_project_ticket(project_ticket, existing_data: Optional[Dict[str, Any]] = None) -> bool:
     """
     Update an existing project ticket with fresh Bluestakes data.
     Does not update project_id, ticket_number, or company_id (immutable fields).
+
+    Args:
+        project_ticket: ProjectTicketCreate with the fresh data
+        existing_data: Stored row (e.g. from get_existing_tickets_data); columns it holds
+            with an identical value are left out of the update
+
+    Returns:
+        True if a row was updated, False otherwise
     """
     try:
         update_data = {
@@ -671,11 +864,15 @@ async def update_project_ticket(project_ticket) -> bool:
             "responses": project_ticket.responses if hasattr(project_ticket, 'responses') else []
         }
 
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .update(update_data)
-                 .eq("ticket_number", project_ticket.ticket_number)
-                 .execute())
+        # Send only the columns that differ from the stored row; columns it doesn't hold are always sent
+        if existing_data:
+            update_data = {key: value for key, value in update_data.items()
+                           if key not in existing_data or existing_data[key] != value}
+
+        result = await execute_async(get_service_client()
+                                     .table("project_tickets")
+                                     .update(update_data)
+                                     .eq("ticket_number", project_ticket.ticket_number))
 
         return bool(result.data)
 
@@ -687,76 +884,125 @@ async def update_project_ticket(project_ticket) -> bool:
 async def link_orphaned_tickets_to_projects() -> Dict[str, int]:
     """
     Link tickets with project_id=null to projects based on old_ticket relationships.
-    
+
+    Runs the link_orphaned_tickets database function (sql/link_orphaned_tickets.sql),
+    which does the whole join-update in one statement. Falls back to linking from
+    Python if the function has not been installed yet.
+
+    Returns:
+        Dict with counts of tickets linked and old tickets updated
+    """
+    try:
+        result = await execute_async(get_service_client().rpc("link_orphaned_tickets"))
+        row = result.data[0] if result.data else {}
+        return {
+            "linked": row.get("linked") or 0,
+            "old_tickets_updated": row.get("old_tickets_updated") or 0
+        }
+
+    except APIError as e:
+        if e.code != UNDEFINED_FUNCTION_CODE:
+            logger.error(f"Error in link_orphaned_tickets_to_projects: {str(e)}")
+            raise
+        logger.warning("link_orphaned_tickets database function not found, linking orphaned tickets from Python")
+        return await _link_orphaned_tickets_in_python()
+
+
+async def _link_orphaned_tickets_in_python() -> Dict[str, int]:
+    """
+    Link orphaned tickets from Python (fallback for link_orphaned_tickets_to_projects).
+
     Logic:
-    1. Find all tickets where project_id is null and old_ticket is not null
-    2. For each such ticket, look up the old_ticket in the database
-    3. If the old_ticket exists and has a project_id, assign the new ticket to the same project
-    4. Update the old ticket to set is_continue_update to FALSE
-    
+    1. Page through tickets where project_id is null and old_ticket is not null
+    2. Look up the old_tickets referenced by the page (one query per page)
+    3. Orphans whose old_ticket has a project_id are assigned to the same project
+       (one update per project)
+    4. Update the old tickets to set is_continue_update to FALSE (one update per company)
+
     Returns:
         Dict with counts of tickets linked and old tickets updated
     """
+    client = get_service_client()
+
     try:
-        # Step 1: Get all orphaned tickets that have an old_ticket reference
-        orphaned_result = (get_service_client()
-                          .table("project_tickets")
-                          .select("id, ticket_number, old_ticket, company_id")
-                          .is_("project_id", "null")
-                          .not_.is_("old_ticket", "null")
-                          .neq("old_ticket", "")
-                          .execute())
-        
-        if not orphaned_result.data:
-            return {"linked": 0, "old_tickets_updated": 0}
-        
-        orphaned_tickets = orphaned_result.data
-        
         linked_count = 0
-        old_tickets_updated_count = 0
-        
-        # Step 2: Process each orphaned ticket
-        for ticket in orphaned_tickets:
+
+        # (old_ticket_number, company_id) pairs to close out once linking is done
+        old_tickets_to_close = set()
+
+        # Step 1: Page through orphaned tickets that have an old_ticket reference.
+        # Keyset pagination on id: linked tickets drop out of the filter, so offsets would skip rows.
+        last_id = None
+        while True:
+            query = (client
+                     .table("project_tickets")
+                     .select("id, ticket_number, old_ticket, company_id")
+                     .is_("project_id", "null")
+                     .not_.is_("old_ticket", "null")
+                     .neq("old_ticket", ""))
+            if last_id is not None:
+                query = query.gt("id", last_id)
+
+            orphaned_result = await execute_async(query.order("id").limit(ORPHAN_PAGE_SIZE))
+            orphaned_tickets = orphaned_result.data or []
+            if not orphaned_tickets:
+                break
+            last_id = orphaned_tickets[-1]["id"]
+
+            # Step 2: Look up the old tickets referenced by this page in one query
+            # (ticket numbers are unique: uq_project_tickets_ticket_number)
+            old_ticket_numbers = list({ticket["old_ticket"] for ticket in orphaned_tickets})
             try:
-                ticket_id = ticket["id"]
-                old_ticket_number = ticket["old_ticket"]
-                company_id = ticket["company_id"]
-                
-                # Step 3: Look up the old ticket in the database
-                old_ticket_result = (get_service_client()
-                                   .table("project_tickets")
-                                   .select("project_id")
-                                   .eq("ticket_number", old_ticket_number)
-                                   .eq("company_id", company_id)  # Ensure same company
-                                   .not_.is_("project_id", "null")
-                                   .limit(1)
-                                   .execute())
-                
-                if old_ticket_result.data:
-                    project_id = old_ticket_result.data[0]["project_id"]
-                    
-                    # Step 4: Update the orphaned ticket with the project_id
-                    update_result = (get_service_client()
-                                   .table("project_tickets")
-                                   .update({"project_id": project_id})
-                                   .eq("id", ticket_id)
-                                   .execute())
-                    
-                    if update_result.data:
-                        linked_count += 1
-                        
-                        # Update the old ticket to set is_continue_update to FALSE
-                        try:
-                            if await update_old_ticket_continue_status(old_ticket_number, company_id):
-                                old_tickets_updated_count += 1
-                        except Exception as e:
-                            logger.error(f"Error updating old ticket {old_ticket_number} continue status: {str(e)}")
-                    else:
-                        logger.warning(f"Failed to update ticket {ticket['ticket_number']} with project_id {project_id}")
-                    
+                old_ticket_result = await execute_async(client
+                                                        .table("project_tickets")
+                                                        .select("ticket_number, company_id, project_id")
+                                                        .in_("ticket_number", old_ticket_numbers)
+                                                        .not_.is_("project_id", "null"))
             except Exception as e:
-                logger.error(f"Error processing orphaned ticket {ticket.get('ticket_number', 'unknown')}: {str(e)}")
+                logger.error(f"Error looking up old tickets for {len(orphaned_tickets)} orphaned tickets: {str(e)}")
                 continue
+
+            # An orphan only inherits the project of an old ticket from its own company
+            old_ticket_projects = {
+                (row["ticket_number"], row["company_id"]): row["project_id"]
+                for row in old_ticket_result.data or []
+            }
+
+            # Step 3: Group the orphaned tickets by the project they inherit
+            tickets_by_project = defaultdict(list)
+            for ticket in orphaned_tickets:
+                project_id = old_ticket_projects.get((ticket["old_ticket"], ticket["company_id"]))
+                if project_id is not None:
+                    tickets_by_project[project_id].append(ticket)
+
+            # Step 4: Update the orphaned tickets with the project_id (one update per project)
+            for project_id, tickets in tickets_by_project.items():
+                try:
+                    update_result = await execute_with_retry(client
+                                                             .table("project_tickets")
+                                                             .update({"project_id": project_id})
+                                                             .in_("id", [ticket["id"] for ticket in tickets]))
+
+                    if update_result.data:
+                        linked_count += len(update_result.data)
+                        old_tickets_to_close.update((ticket["old_ticket"], ticket["company_id"]) for ticket in tickets)
+                    else:
+                        logger.warning(f"Failed to link {len(tickets)} orphaned tickets to project {project_id}")
+
+                except Exception as e:
+                    logger.error(f"Error linking {len(tickets)} orphaned tickets to project {project_id}: {str(e)}")
+                    continue
+
+            if len(orphaned_tickets) < ORPHAN_PAGE_SIZE:
+                break
+
+        # Step 5: Set is_continue_update to FALSE on the linked old tickets (one update per company)
+        old_tickets_updated_count = 0
+        try:
+            continue_results = await update_old_tickets_continue_status(old_tickets_to_close)
+            old_tickets_updated_count = sum(continue_results.values())
+        except Exception as e:
+            logger.error(f"Error updating continue status of {len(old_tickets_to_close)} old tickets: {str(e)}")
         
         return {"linked": linked_count, "old_tickets_updated": old_tickets_updated_count}
         
@@ -768,6 +1014,7 @@ async def link_orphaned_tickets_to_projects() -> Dict[str, int]:
 async def update_old_ticket_continue_status(old_ticket_number: str, company_id: int) -> bool:
     """
     Update the is_continue_update status to FALSE for an old ticket when a new ticket is linked to a project.
+    (Thin wrapper around update_old_tickets_continue_status)
     
     Args:
         old_ticket_number: The ticket number of the old ticket to update
@@ -777,20 +1024,92 @@ async def update_old_ticket_continue_status(old_ticket_number: str, company_id:
         bool: True if the update was successful, False otherwise
     """
     try:
-        # Update the old ticket to set is_continue_update to FALSE
-        update_result = (get_service_client()
-                        .table("project_tickets")
-                        .update({"is_continue_update": False})
-                        .eq("ticket_number", old_ticket_number)
-                        .eq("company_id", company_id)
-                        .execute())
-        
-        if update_result.data:
-            return True
-        else:
-            logger.warning(f"No old ticket found to update: {old_ticket_number} for company {company_id}")
-            return False
-            
+        results = await update_old_tickets_continue_status([(old_ticket_number, company_id)])
     except Exception as e:
-        logger.error(f"Error updating old ticket {old_ticket_number} continue status: {str(e)}")
-        raise
+        logger.error("Error updating continue status for old ticket %s: %s", old_ticket_number, e,
+                     extra={"ticket": old_ticket_number, "company": company_id})
+        return False
+    return results.get((old_ticket_number, company_id), False)
+
+
+async def update_old_tickets_continue_status(pairs: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], bool]:
+    """
+    Set is_continue_update to FALSE for many old tickets in one round trip.
+
+    Uses the bulk_set_continue_status database function (sql/bulk_set_continue_status.sql);
+    if it has not been installed yet, falls back to one update per company.
+
+    Args:
+        pairs: (old_ticket_number, company_id) pairs to update
+
+    Returns:
+        Dict mapping each (old_ticket_number, company_id) pair to True if its row was updated,
+        False otherwise
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    records = [
+        {"ticket_number": old_ticket_number, "company_id": company_id, "is_continue_update": False}
+        for old_ticket_number, company_id in pairs
+    ]
+
+    try:
+        result = await execute_with_retry(get_service_client()
+                                          .rpc("bulk_set_continue_status", {"records": records}))
+        updated = {(row["ticket_number"], row["company_id"]) for row in result.data or []}
+
+    except APIError as e:
+        if e.code != UNDEFINED_FUNCTION_CODE:
+            logger.error(f"Error updating continue status of {len(pairs)} old tickets: {str(e)}")
+            raise
+        logger.warning("bulk_set_continue_status database function not found, updating per company")
+        updated = await _set_continue_update_false_per_company(pairs)
+
+    results = {}
+    for old_ticket_number, company_id in pairs:
+        results[(old_ticket_number, company_id)] = (old_ticket_number, company_id) in updated
+        if (old_ticket_number, company_id) not in updated:
+            logger.warning("No old ticket found to update: %s for company %s", old_ticket_number, company_id,
+                           extra={"ticket": old_ticket_number, "company": company_id})
+
+    return results
+
+
+async def _set_continue_update_false_per_company(pairs: Iterable[Tuple[str, int]]) -> set:
+    """
+    Fallback for update_old_tickets_continue_status: one update per company,
+    at most CONTINUE_UPDATE_CONCURRENCY in flight at once.
+
+    Returns:
+        Set of (old_ticket_number, company_id) pairs that were updated
+    """
+    numbers_by_company = defaultdict(set)
+    for old_ticket_number, company_id in pairs:
+        numbers_by_company[company_id].add(old_ticket_number)
+
+    semaphore = asyncio.Semaphore(CONTINUE_UPDATE_CONCURRENCY)
+
+    async def update_company(company_id: int, old_ticket_numbers: set) -> List[Tuple[str, int]]:
+        async with semaphore:
+            try:
+                update_result = await execute_with_retry(get_service_client()
+                                                         .table("project_tickets")
+                                                         .update({"is_continue_update": False})
+                                                         .in_("ticket_number", list(old_ticket_numbers))
+                                                         .eq("company_id", company_id))
+                return [(row["ticket_number"], company_id) for row in update_result.data or []]
+            except Exception as e:
+                logger.error(f"Error updating continue status of {len(old_ticket_numbers)} old tickets "
+                             f"for company {company_id}: {str(e)}")
+                return []
+
+    results = await asyncio.gather(
+        *(update_company(company_id, numbers) for company_id, numbers in numbers_by_company.items())
+    )
+
+    updated = set()
+    for company_updated in results:
+        updated.update(company_updated)
+    return updated
@@ -3,15 +3,31 @@ Updatable tickets management functions.
 These functions handle the identification and management of tickets that can be updated,
 including syncing with BlueStakes API to check for update availability.
 """
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from config.supabase_client import get_service_client
-from utils.bluestakes import get_bluestakes_auth_token, get_ticket_secondary_functions
-from utils.encryption import safe_decrypt_password, EncryptionError
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Tuple
+from postgrest.exceptions import APIError
+from config.supabase_client import get_service_client, execute_async
+from utils.bluestakes import get_ticket_secondary_functions
+from utils.bluestakes_token_manager import get_token_for_company
+from tasks.job_stats import record_error
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of concurrent secondary-functions requests (shared by all companies in a run)
+SECONDARY_FUNCTIONS_CONCURRENCY = 16
+
+# PostgREST error code returned when an RPC function does not exist
+UNDEFINED_FUNCTION_CODE = "PGRST202"
+
+# Maximum rows sent in a single updatable_tickets insert
+UPDATABLE_INSERT_CHUNK_SIZE = 500
+
+# Maximum number of companies checked at the same time
+COMPANY_SYNC_CONCURRENCY = int(os.getenv("BLUESTAKES_CONCURRENCY", "8"))
+
 
 async def sync_updateable_tickets(company_id: int = None) -> Dict[str, Any]:
     """
@@ -33,71 +49,63 @@ async def sync_updateable_tickets(company_id: int = None) -> Dict[str, Any]:
         "tickets_checked": 0,
         "tickets_added": 0,
         "api_failures": 0,
-        "errors": []
+        "errors": [],
+        "errors_total": 0
     }
     
     try:
         # Get companies to process
         companies = await get_companies_for_updateable_sync(company_id)
-        
-        for company in companies:
-            company_stats = {"tickets_processed": 0, "tickets_checked": 0, "tickets_added": 0, "api_failures": 0}
-            
+
+        # One replace_by_date window for the whole run so every company sees the same cutoff
+        now_iso, cutoff_iso = get_updatable_window()
+
+        # Fetch every company's candidates up front so the database round trips overlap
+        all_candidates = await asyncio.gather(
+            *(get_updatable_ticket_candidates(company["id"], now_iso, cutoff_iso) for company in companies),
+            return_exceptions=True
+        )
+
+        # Companies run concurrently; the secondary-functions limit is shared so the
+        # total load on BlueStakes stays bounded however many companies are in flight
+        company_semaphore = asyncio.Semaphore(COMPANY_SYNC_CONCURRENCY)
+        check_semaphore = asyncio.Semaphore(SECONDARY_FUNCTIONS_CONCURRENCY)
+
+        async def sync_company(company: Dict[str, Any], updatable_tickets) -> Dict[str, int]:
+            async with company_semaphore:
+                return await _sync_company_updatable_tickets(company, updatable_tickets, check_semaphore, stats)
+
+        results = await asyncio.gather(
+            *(sync_company(company, candidates) for company, candidates in zip(companies, all_candidates)),
+            return_exceptions=True
+        )
+
+        updatable_ticket_numbers = []
+        for company, company_stats in zip(companies, results):
+            if isinstance(company_stats, Exception):
+                stats["companies_failed"] += 1
+                error_msg = f"Failed to sync company {company['id']}: {str(company_stats)}"
+                logger.error(error_msg)
+                record_error(stats, error_msg)
+                continue
+
+            # Update overall stats
+            stats["tickets_processed"] += company_stats["tickets_processed"]
+            stats["tickets_checked"] += company_stats["tickets_checked"]
+            stats["api_failures"] += company_stats["api_failures"]
+            stats["companies_processed"] += 1
+            updatable_ticket_numbers.extend(company_stats["updatable_ticket_numbers"])
+
+        # Add every company's tickets with updates available in one write per chunk
+        for start in range(0, len(updatable_ticket_numbers), UPDATABLE_INSERT_CHUNK_SIZE):
+            chunk = updatable_ticket_numbers[start:start + UPDATABLE_INSERT_CHUNK_SIZE]
             try:
-                # Get tickets that meet updatable criteria for this company
-                updatable_tickets = await get_updatable_ticket_candidates(company["id"])
-                company_stats["tickets_processed"] = len(updatable_tickets)
-                
-                try:
-                    # Decrypt the password before using it
-                    decrypted_password = safe_decrypt_password(company["bluestakes_password"])
-                except EncryptionError as e:
-                    logger.error(f"Failed to decrypt password for company {company['id']}: {str(e)}")
-                    company_stats["api_failures"] += 1
-                    continue
-                
-                # Get BlueStakes auth token (with caching)
-                token = await get_bluestakes_auth_token(
-                    company["bluestakes_username"], 
-                    decrypted_password,
-                    company["id"]  # Pass company_id for token caching
-                )
-                
-                # Process each ticket
-                for ticket in updatable_tickets:
-                    try:
-                        # Check if ticket has updates available via BlueStakes API
-                        secondary_functions = await get_ticket_secondary_functions(
-                            token,
-                            ticket["ticket_number"]
-                        )
-                        
-                        company_stats["tickets_checked"] += 1
-                        
-                        # Check if ticket has update=true
-                        if secondary_functions.get("update") is True:
-                            # Add ticket to updatable_tickets table
-                            await insert_updatable_ticket(ticket["ticket_number"])
-                            company_stats["tickets_added"] += 1
-                            
-                    except Exception as e:
-                        company_stats["api_failures"] += 1
-                        error_msg = f"Error processing ticket {ticket.get('ticket_number', 'unknown')} for company {company['id']}: {str(e)}"
-                        logger.error(error_msg)
-                        stats["errors"].append(error_msg)
-                
-                # Update overall stats
-                stats["tickets_processed"] += company_stats["tickets_processed"]
-                stats["tickets_checked"] += company_stats["tickets_checked"]
-                stats["tickets_added"] += company_stats["tickets_added"]
-                stats["api_failures"] += company_stats["api_failures"]
-                stats["companies_processed"] += 1
-                
+                stats["tickets_added"] += await bulk_insert_updatable_tickets(chunk)
             except Exception as e:
-                stats["companies_failed"] += 1
-                error_msg = f"Failed to sync company {company['id']}: {str(e)}"
+                stats["api_failures"] += 1
+                error_msg = f"Error inserting {len(chunk)} updatable tickets: {str(e)}"
                 logger.error(error_msg)
-                stats["errors"].append(error_msg)
+                record_error(stats, error_msg)
         
         logger.info(f"Updatable tickets sync completed: {stats}")
         return stats
@@ -105,36 +113,100 @@ async def sync_updateable_tickets(company_id: int = None) -> Dict[str, Any]:
     except Exception as e:
         error_msg = f"Fatal error in updatable tickets sync: {str(e)}"
         logger.error(error_msg)
-        stats["errors"].append(error_msg)
+        record_error(stats, error_msg)
         return stats
 
 
+async def _sync_company_updatable_tickets(company: Dict[str, Any], updatable_tickets,
+                                          check_semaphore: asyncio.Semaphore,
+                                          stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Check one company's candidate tickets for available updates.
+
+    Args:
+        company: Company row with at least "id"
+        updatable_tickets: Candidates from get_updatable_ticket_candidates, or the
+            exception raised while fetching them
+        check_semaphore: Limits concurrent secondary-functions requests across companies
+        stats: Run statistics (errors are recorded here)
+
+    Returns:
+        Per-company statistics plus the "updatable_ticket_numbers" to insert
+        (none if the company's token could not be obtained)
+    """
+    company_stats = {"tickets_processed": 0, "tickets_checked": 0, "api_failures": 0,
+                     "updatable_ticket_numbers": []}
+
+    # Tickets that meet updatable criteria for this company
+    if isinstance(updatable_tickets, Exception):
+        raise updatable_tickets
+    company_stats["tickets_processed"] = len(updatable_tickets)
+
+    # Get BlueStakes auth token (cached; credentials are only decrypted on a cache miss)
+    try:
+        token = await get_token_for_company(company["id"])
+    except Exception as e:
+        # get_token_for_company logs the cause (decryption, login) and raises HTTPException
+        logger.error(f"Failed to get BlueStakes token for company {company['id']}: {str(e)}")
+        company_stats["api_failures"] += 1
+        return company_stats
+
+    # Check every candidate concurrently (bounded) instead of one request at a time
+    async def check_ticket(ticket_number: str) -> Dict[str, Any]:
+        async with check_semaphore:
+            return await get_ticket_secondary_functions(token, ticket_number)
+
+    results = await asyncio.gather(
+        *(check_ticket(ticket["ticket_number"]) for ticket in updatable_tickets),
+        return_exceptions=True
+    )
+
+    updatable_ticket_numbers = company_stats["updatable_ticket_numbers"]
+    for ticket, result in zip(updatable_tickets, results):
+        if isinstance(result, Exception):
+            company_stats["api_failures"] += 1
+            error_msg = f"Error processing ticket {ticket.get('ticket_number', 'unknown')} for company {company['id']}: {str(result)}"
+            logger.error(error_msg)
+            record_error(stats, error_msg)
+            continue
+
+        company_stats["tickets_checked"] += 1
+
+        # Check if ticket has update=true
+        if result.get("update") is True:
+            updatable_ticket_numbers.append(ticket["ticket_number"])
+
+    return company_stats
+
+
 async def get_companies_for_updateable_sync(company_id: int = None) -> List[Dict[str, Any]]:
     """
     Get companies that have BlueStakes credentials configured for updateable tickets sync.
+    (Same companies as the ticket sync: see get_companies_with_bluestakes_credentials)
     """
+    # Imported here: tasks.ticket_sync imports this module
+    from tasks.ticket_sync import get_companies_with_bluestakes_credentials
+
     try:
-        query = get_service_client().table("companies").select("id, name, bluestakes_username, bluestakes_password")
-        
-        # Filter for companies with BlueStakes credentials
-        query = query.not_.is_("bluestakes_username", "null").not_.is_("bluestakes_password", "null")
-        
-        if company_id:
-            query = query.eq("id", company_id)
-        
-        result = query.execute()
-        
-        if not result.data:
-            return []
-        
-        return result.data
+        return await get_companies_with_bluestakes_credentials(company_id)
         
     except Exception as e:
         logger.error(f"Error fetching companies for updateable sync: {str(e)}")
         raise
 
 
-async def get_updatable_ticket_candidates(company_id: int) -> List[Dict[str, Any]]:
+def get_updatable_window() -> Tuple[str, str]:
+    """
+    Return the replace_by_date window (now through 7 days from now) as ISO strings.
+
+    In UTC and truncated to whole seconds so repeated runs send stable filter values.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    return now.isoformat(), (now + timedelta(days=7)).isoformat()
+
+
+async def get_updatable_ticket_candidates(company_id: int, now_iso: str = None,
+                                          cutoff_iso: str = None) -> List[Dict[str, Any]]:
     """
     Query the database for tickets that meet the criteria for being updatable.
     
@@ -142,20 +214,41 @@ async def get_updatable_ticket_candidates(company_id: int) -> List[Dict[str, Any
     - Tickets with is_continue_update = True
     - Tickets where replace_by_date is no more than 7 days in the future
     - Tickets not already in the updatable_tickets table
+
+    The whole filter runs in the database (sql/get_updatable_candidates.sql); if that
+    function is not installed yet, the anti-join against updatable_tickets is done here.
+
+    Args:
+        company_id: Company to query
+        now_iso: Start of the replace_by_date window (from get_updatable_window)
+        cutoff_iso: End of the window; both are computed here when not given
     """
     try:
-        # Calculate cutoff date (7 days from now)
-        future_cutoff = datetime.now() + timedelta(days=7)
+        client = get_service_client()
+
+        if now_iso is None or cutoff_iso is None:
+            now_iso, cutoff_iso = get_updatable_window()
+
+        try:
+            result = await execute_async(client.rpc("get_updatable_candidates", {
+                "p_company_id": company_id,
+                "p_now": now_iso,
+                "p_cutoff": cutoff_iso
+            }))
+            return result.data or []
+        except APIError as e:
+            if e.code != UNDEFINED_FUNCTION_CODE:
+                raise
+            logger.warning("get_updatable_candidates database function not found, filtering in Python")
         
         # Query project_tickets for updatable candidates
-        result = (get_service_client()
-                 .table("project_tickets")
-                 .select("id, ticket_number, project_id, replace_by_date, legal_date, company_id")
-                 .eq("company_id", company_id)
-                 .eq("is_continue_update", True)
-                 .lte("replace_by_date", future_cutoff.isoformat())
-                 .gte("replace_by_date", datetime.now().isoformat())
-                 .execute())
+        result = await execute_async(client
+                                     .table("project_tickets")
+                                     .select("ticket_number")
+                                     .eq("company_id", company_id)
+                                     .eq("is_continue_update", True)
+                                     .lte("replace_by_date", cutoff_iso)
+                                     .gte("replace_by_date", now_iso))
         
         if not result.data:
             return []
@@ -163,11 +256,10 @@ async def get_updatable_ticket_candidates(company_id: int) -> List[Dict[str, Any
         # Filter out tickets that are already in updatable_tickets table
         ticket_numbers = [ticket["ticket_number"] for ticket in result.data]
         
-        existing_updatable = (get_service_client()
-                            .table("updatable_tickets")
-                            .select("ticket_number")
-                            .in_("ticket_number", ticket_numbers)
-                            .execute())
+        existing_updatable = await execute_async(client
+                                                 .table("updatable_tickets")
+                                                 .select("ticket_number")
+                                                 .in_("ticket_number", ticket_numbers))
         
         existing_numbers = set(ticket["ticket_number"] for ticket in existing_updatable.data or [])
         
@@ -189,32 +281,39 @@ async def insert_updatable_ticket(ticket_number: str) -> bool:
         ticket_number: The ticket number to insert
         
     Returns:
-        bool: True if insertion was successful
+        bool: True if a new row was inserted, False if the ticket was already present
     """
+    return await bulk_insert_updatable_tickets([ticket_number]) > 0
+
+
+async def bulk_insert_updatable_tickets(ticket_numbers: List[str]) -> int:
+    """
+    Insert many tickets into the updatable_tickets table with a single upsert.
+
+    Relies on the unique index on updatable_tickets.ticket_number
+    (sql/add_updatable_tickets_ticket_number_unique.sql); tickets that are
+    already present are skipped by the database instead of a pre-insert SELECT.
+
+    Args:
+        ticket_numbers: The ticket numbers to insert
+
+    Returns:
+        int: Number of rows actually inserted
+    """
+    if not ticket_numbers:
+        return 0
+
     try:
-        # Check if ticket already exists (prevent duplicates)
-        existing = (get_service_client()
-                   .table("updatable_tickets")
-                   .select("id")
-                   .eq("ticket_number", ticket_number)
-                   .execute())
-        
-        if existing.data:
-            return False
-        
-        # Insert new record
-        insert_data = {
-            "ticket_number": ticket_number
-            # created_at will be automatically set by the database default
-        }
-        
-        result = (get_service_client()
-                 .table("updatable_tickets")
-                 .insert(insert_data)
-                 .execute())
-        
-        return bool(result.data)
-        
+        # created_at will be automatically set by the database default
+        # Duplicates would only be resolved as conflicts by the database; send each ticket once
+        rows = [{"ticket_number": ticket_number} for ticket_number in sorted(set(ticket_numbers))]
+
+        result = await execute_async(get_service_client()
+                                     .table("updatable_tickets")
+                                     .upsert(rows, on_conflict="ticket_number", ignore_duplicates=True))
+
+        return len(result.data) if result.data else 0
+
     except Exception as e:
-        logger.error(f"Error inserting updatable ticket {ticket_number}: {str(e)}")
+        logger.error(f"Error inserting {len(ticket_numbers)} updatable tickets: {str(e)}")
         raise
@@ -2,12 +2,28 @@
 User management functions for project assignments and user queries.
 These functions handle user-project relationships and user data retrieval.
 """
+import asyncio
 import logging
-from typing import Dict, Any, List
-from config.supabase_client import get_service_client
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Any, List, Tuple
+from postgrest.exceptions import APIError
+from config.supabase_client import get_service_client, execute_async
 
 logger = logging.getLogger(__name__)
 
+# PostgREST error code returned when an RPC function does not exist
+UNDEFINED_FUNCTION_CODE = "PGRST202"
+
+# Rows fetched per page of the weekly_digest_assignments function
+DIGEST_ASSIGNMENT_PAGE_SIZE = 1000
+
+# Users fetched per page of the unique_assigned_users function
+UNIQUE_USERS_PAGE_SIZE = 1000
+
+# Users whose assigned projects are looked up at the same time (when that function is missing)
+ASSIGNMENT_LOOKUP_CONCURRENCY = 16
+
 
 async def get_assigned_projects_for_user(email: str) -> List[Dict[str, Any]]:
     """
@@ -24,31 +40,30 @@ async def get_assigned_projects_for_user(email: str) -> List[Dict[str, Any]]:
             return []
 
         # Fetch assignments for the email (case-insensitive match against user_email)
-        assignments_result = (get_service_client()
-                             .table("project_assignments")
-                             .select("project_id")
-                             .ilike("user_email", email.strip())
-                             .execute())
+        assignments_result = await execute_async(get_service_client()
+                                                 .table("project_assignments")
+                                                 .select("project_id")
+                                                 .ilike("user_email", email.strip()))
 
         assignment_rows = assignments_result.data or []
         if not assignment_rows:
             return []
 
-        project_ids = sorted({row.get("project_id") for row in assignment_rows if row.get("project_id") is not None})
+        # The IN filter doesn't care about order, so the ids are only de-duplicated
+        project_ids = list({row["project_id"] for row in assignment_rows if row.get("project_id") is not None})
         if not project_ids:
             return []
 
-        # Fetch project metadata
-        projects_result = (get_service_client()
-                          .table("projects")
-                          .select("id, name, company_id")
-                          .in_("id", project_ids)
-                          .execute())
+        # Fetch project metadata, sorted deterministically by name then id in the database
+        projects_result = await execute_async(get_service_client()
+                                              .table("projects")
+                                              .select("id, name, company_id")
+                                              .in_("id", project_ids)
+                                              .order("name")
+                                              .order("id")
+                                              .limit(len(project_ids)))
 
-        projects = projects_result.data or []
-        # Sort deterministically by name then id
-        projects.sort(key=lambda p: (p.get("name") or "", p.get("id") or 0))
-        return projects
+        return projects_result.data or []
 
     except Exception as e:
         logger.error(f"Error fetching assigned projects for {email}: {str(e)}")
@@ -62,49 +77,144 @@ async def get_unique_assigned_users() -> List[Dict[str, Any]]:
     Selection rules when duplicates exist across projects/roles:
     - Prefer the most recently assigned entry by assigned_at.
 
+    De-duplication runs in the database (sql/unique_assigned_users.sql) so only one
+    row per user is transferred, a page at a time; if that function is not
+    installed yet, the assignments are paged through and de-duplicated here.
+
     Returns:
-        List of objects: { "email": str, "name": str }
+        List of objects: { "email": str, "name": str }, sorted by email
+    """
+    users = []
+    try:
+        # Paged so PostgREST's max-rows cap can't silently cut the list short
+        while True:
+            start = len(users)
+            result = await execute_async(get_service_client()
+                                         .rpc("unique_assigned_users", {})
+                                         .range(start, start + UNIQUE_USERS_PAGE_SIZE - 1))
+            page = result.data or []
+            users.extend({"email": row["email"], "name": row.get("name")} for row in page)
+            if len(page) < UNIQUE_USERS_PAGE_SIZE:
+                return users
+
+    except APIError as e:
+        if e.code != UNDEFINED_FUNCTION_CODE:
+            logger.error(f"Error fetching unique assigned users: {str(e)}")
+            raise
+        logger.warning("unique_assigned_users database function not found, de-duplicating in Python")
+        return await _get_unique_assigned_users_paged()
+
+
+async def _get_unique_assigned_users_paged() -> List[Dict[str, Any]]:
+    """
+    Fallback for get_unique_assigned_users: page through project_assignments and de-duplicate here.
     """
     try:
         page_size = 1000
-        offset = 0
-        email_to_user: Dict[str, Dict[str, Any]] = {}
+        last_id = None
+        # lower-cased email -> (email, name, assigned_at); tuples are cheaper than dicts per row
+        email_to_user: Dict[str, Tuple[str, Any, str]] = {}
+        existing_user = email_to_user.get
+        row_fields = itemgetter("user_email", "user_name", "assigned_at")
 
         while True:
-            result = (get_service_client()
+            # Keyset pagination on id: each page costs the same however deep we are
+            query = (get_service_client()
                      .table("project_assignments")
-                     .select("user_email,user_name,assigned_at")
-                     .range(offset, offset + page_size - 1)
-                     .execute())
+                     .select("id,user_email,user_name,assigned_at"))
+            if last_id is not None:
+                query = query.gt("id", last_id)
+
+            result = await execute_async(query.order("id").limit(page_size))
 
             rows = result.data or []
             if not rows:
                 break
+            last_id = rows[-1]["id"]
 
             for row in rows:
-                raw_email = (row.get("user_email") or "").strip()
+                raw_email, user_name, assigned_at = row_fields(row)
+                raw_email = (raw_email or "").strip()
                 if not raw_email:
                     continue
                 email_key = raw_email.lower()
-                user_name = row.get("user_name")
-                assigned_at = row.get("assigned_at") or ""
+                assigned_at = assigned_at or ""
 
-                existing = email_to_user.get(email_key)
-                if not existing or (assigned_at and existing.get("assigned_at", "") < assigned_at):
-                    email_to_user[email_key] = {
-                        "email": raw_email,
-                        "name": user_name,
-                        "assigned_at": assigned_at,
-                    }
+                existing = existing_user(email_key)
+                if existing is None or (assigned_at and existing[2] < assigned_at):
+                    email_to_user[email_key] = (raw_email, user_name, assigned_at)
 
             if len(rows) < page_size:
                 break
-            offset += page_size
 
-        users = [{"email": u["email"], "name": u.get("name")} for u in email_to_user.values()]
-        users.sort(key=lambda u: (u.get("email") or "").lower())
-        return users
+        return [{"email": email, "name": name} for email_key, (email, name, _) in sorted(email_to_user.items())]
 
     except Exception as e:
         logger.error(f"Error fetching unique assigned users: {str(e)}")
         raise
+
+
+async def get_weekly_digest_assignments() -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Return every assigned user together with the projects they are assigned to.
+
+    Runs the weekly_digest_assignments database function (sql/weekly_digest_assignments.sql),
+    which joins users, assignments and projects in one call; if it has not been
+    installed yet, falls back to get_unique_assigned_users plus one
+    get_assigned_projects_for_user lookup per user (run concurrently).
+
+    Returns:
+        List of (user, projects) pairs sorted by email, where user is { "email": str, "name": str }
+        and projects are { "id", "name", "company_id" } sorted by name then id.
+        Users without projects are left out.
+    """
+    rows = []
+    try:
+        while True:
+            start = len(rows)
+            result = await execute_async(get_service_client()
+                                         .rpc("weekly_digest_assignments", {})
+                                         .range(start, start + DIGEST_ASSIGNMENT_PAGE_SIZE - 1))
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < DIGEST_ASSIGNMENT_PAGE_SIZE:
+                break
+
+    except APIError as e:
+        if e.code != UNDEFINED_FUNCTION_CODE:
+            logger.error(f"Error fetching weekly digest assignments: {str(e)}")
+            raise
+        logger.warning("weekly_digest_assignments database function not found, looking up projects per user")
+        return await _get_weekly_digest_assignments_per_user()
+
+    # Rows arrive ordered by user, so each user's projects are consecutive
+    return [
+        (
+            {"email": email, "name": user_rows[0].get("name")},
+            [
+                {"id": row["project_id"], "name": row["project_name"], "company_id": row["company_id"]}
+                for row in user_rows
+            ]
+        )
+        for email, user_rows in ((email, list(group)) for email, group in groupby(rows, key=itemgetter("email")))
+    ]
+
+
+async def _get_weekly_digest_assignments_per_user() -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """
+    Fallback for get_weekly_digest_assignments: one project lookup per user.
+    """
+    users = await get_unique_assigned_users()
+    slots = asyncio.Semaphore(ASSIGNMENT_LOOKUP_CONCURRENCY)
+
+    async def fetch_user_projects(user: Dict[str, Any]) -> List[Dict[str, Any]]:
+        async with slots:
+            try:
+                return await get_assigned_projects_for_user(user["email"])
+            except Exception as e:
+                logger.error(f"Error fetching assigned projects for {user.get('email', 'unknown')}: {str(e)}")
+                return []
+
+    user_projects_list = await asyncio.gather(*(fetch_user_projects(user) for user in users))
+
+    return [(user, projects) for user, projects in zip(users, user_projects_list) if projects]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the overlap guard on cron-triggered background jobs.
+
+This script tests:
+1. A job is refused with a 409 while the same job with the same arguments runs
+2. The same job with different arguments (another company) is queued normally
+3. A job can be queued again once its previous run has finished
+
+Usage:
+    python test_cron_jobs.py
+"""
+
+import os
+import sys
+import unittest
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import BackgroundTasks, HTTPException
+
+from routes import cron
+
+
+async def job(*args):
+    pass
+
+
+class QueueExclusiveJobTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        cron._running_jobs.clear()
+
+    def test_same_arguments_are_refused_with_409(self):
+        cron.queue_exclusive_job(BackgroundTasks(), "sync", job, 1, 28)
+
+        with self.assertRaises(HTTPException) as raised:
+            cron.queue_exclusive_job(BackgroundTasks(), "sync", job, 1, 28)
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertIn("already running", raised.exception.detail)
+
+    def test_other_company_is_not_blocked(self):
+        background_tasks = BackgroundTasks()
+        cron.queue_exclusive_job(background_tasks, "sync", job, 2, 28)
+        cron.queue_exclusive_job(background_tasks, "sync", job, 1, 7)
+
+        self.assertEqual(len(background_tasks.tasks), 2)
+
+    async def test_job_can_be_queued_again_after_it_finishes(self):
+        background_tasks = BackgroundTasks()
+        cron.queue_exclusive_job(background_tasks, "sync", job, 1, 28)
+        await background_tasks()
+
+        cron.queue_exclusive_job(BackgroundTasks(), "sync", job, 1, 28)
+        self.assertEqual(cron._running_jobs, {("sync", 1, 28)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive concurrency limiter in front of the BlueStakes API.
+
+This script tests:
+1. A caller cancelled during a Retry-After pause never holds a slot
+2. A burst of concurrent throttled responses halves the limit only once
+3. Successful responses grow the limit again
+4. Transport errors (not only timeouts) count as throttled in bluestakes_request
+
+Usage:
+    python test_rate_limit.py
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from utils import bluestakes
+from utils.rate_limit import AIMDLimiter
+
+
+class AIMDLimiterTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cancelled_during_retry_after_does_not_leak_a_slot(self):
+        limiter = AIMDLimiter(initial=4, minimum=1, maximum=8, increase_every=2)
+        ticket = await limiter.acquire()
+        await limiter.release(ticket, throttled=True, retry_after=60)
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(limiter._in_flight, 0)
+
+    async def test_concurrent_throttles_halve_the_limit_once(self):
+        limiter = AIMDLimiter(initial=8, minimum=1, maximum=8, increase_every=2)
+        tickets = [await limiter.acquire() for _ in range(3)]
+
+        for ticket in tickets:
+            await limiter.release(ticket, throttled=True)
+        self.assertEqual(limiter.limit, 4)
+
+        # A request sent under the lowered limit may lower it again
+        ticket = await limiter.acquire()
+        await limiter.release(ticket, throttled=True)
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter._in_flight, 0)
+
+    async def test_successes_grow_the_limit(self):
+        limiter = AIMDLimiter(initial=2, minimum=1, maximum=3, increase_every=2)
+        for _ in range(4):
+            await limiter.release(await limiter.acquire(), throttled=False)
+
+        self.assertEqual(limiter.limit, 3)
+
+    async def test_incomplete_requests_are_not_successes(self):
+        limiter = AIMDLimiter(initial=2, minimum=1, maximum=3, increase_every=1)
+        await limiter.release(await limiter.acquire(), throttled=False, completed=False)
+
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter._in_flight, 0)
+
+
+class BluestakesRequestTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_connection_error_lowers_the_limit(self):
+        limiter = AIMDLimiter(initial=8, minimum=1, maximum=8, increase_every=2)
+        client = MagicMock()
+        client.request.side_effect = httpx.ConnectError("connection refused")
+
+        with patch.object(bluestakes, "bluestakes_limiter", limiter), \
+                patch.object(bluestakes, "get_http_client", lambda: client):
+            with self.assertRaises(httpx.ConnectError):
+                await bluestakes.bluestakes_request("GET", "https://example.invalid/tickets")
+
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter._in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for execute_with_retry's handling of transient Supabase failures.
+
+This script tests:
+1. A 503 raised as a postgrest APIError is retried until the query succeeds
+2. Non-transient errors (e.g. a missing function) are raised immediately
+3. The last transient error is raised once all attempts are used
+
+Usage:
+    python test_supabase_retry.py
+"""
+
+import os
+import sys
+import unittest
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from postgrest.exceptions import APIError
+
+from config.supabase_client import execute_with_retry, is_retryable_api_error
+
+
+class FakeQuery:
+    """Query builder stand-in whose execute() raises the queued errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def gateway_error(status: int) -> APIError:
+    """The APIError postgrest raises for a non-JSON error response (code is the HTTP status)."""
+    return APIError({"message": "JSON could not be generated", "code": status, "details": "b''"})
+
+
+class ExecuteWithRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_503_is_retried(self):
+        query = FakeQuery(gateway_error(503))
+
+        result = await execute_with_retry(query, attempts=3, base_delay=0)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(query.calls, 2)
+
+    async def test_postgrest_connection_error_is_retried(self):
+        query = FakeQuery(APIError({"code": "PGRST001", "message": "Database connection error"}))
+
+        self.assertEqual(await execute_with_retry(query, attempts=3, base_delay=0), "ok")
+        self.assertEqual(query.calls, 2)
+
+    async def test_missing_function_is_not_retried(self):
+        query = FakeQuery(APIError({"code": "PGRST202", "message": "Could not find the function"}))
+
+        with self.assertRaises(APIError):
+            await execute_with_retry(query, attempts=3, base_delay=0)
+        self.assertEqual(query.calls, 1)
+
+    async def test_gives_up_after_all_attempts(self):
+        query = FakeQuery(gateway_error(503), gateway_error(502), gateway_error(429))
+
+        with self.assertRaises(APIError) as raised:
+            await execute_with_retry(query, attempts=3, base_delay=0)
+        self.assertEqual(raised.exception.code, 429)
+        self.assertEqual(query.calls, 3)
+
+
+class RetryableApiErrorTest(unittest.TestCase):
+
+    def test_classification(self):
+        self.assertTrue(is_retryable_api_error(gateway_error(429)))
+        self.assertTrue(is_retryable_api_error(gateway_error(500)))
+        self.assertTrue(is_retryable_api_error(APIError({"code": "40001"})))
+        self.assertTrue(is_retryable_api_error(APIError({"code": "08006"})))
+        self.assertFalse(is_retryable_api_error(gateway_error(404)))
+        self.assertFalse(is_retryable_api_error(APIError({"code": "23505"})))
+        self.assertFalse(is_retryable_api_error(APIError({})))
+
+
+if __name__ == "__main__":
+    unittest.main()
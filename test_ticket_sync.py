@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tests for the database writes made by the BlueStakes ticket sync.
+
+This script tests:
+1. A failed bulk-insert chunk falls back to one insert per ticket
+2. Tickets that still fail are counted instead of aborting the batch
+3. Old-ticket continue updates go through bulk_set_continue_status, falling
+   back to one update per company when that function is missing
+4. Ticket updates report success from the rows PostgREST returns
+5. ticket_exists answers from a returned row, not from a count
+
+No database is needed: the Supabase calls are replaced with mocks.
+
+Usage:
+    python test_ticket_sync.py
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from postgrest.exceptions import APIError
+
+from tasks import ticket_sync
+
+
+def tickets(*numbers):
+    return [SimpleNamespace(ticket_number=number) for number in numbers]
+
+
+def rows(project_tickets):
+    return [{"ticket_number": p.ticket_number} for p in project_tickets]
+
+
+@patch.object(ticket_sync, "get_service_client", MagicMock())
+@patch.object(ticket_sync, "build_project_ticket_rows", rows)
+class BulkInsertProjectTicketsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_chunks_are_inserted_in_bulk(self):
+        execute = AsyncMock(side_effect=[SimpleNamespace(data=[{}, {}]), SimpleNamespace(data=[{}])])
+        with patch.object(ticket_sync, "execute_with_retry", execute):
+            result = await ticket_sync.bulk_insert_project_tickets(tickets("A", "B", "C"), chunk_size=2)
+
+        self.assertEqual(result, (3, 0))
+        self.assertEqual(execute.await_count, 2)
+
+    async def test_failed_chunk_falls_back_to_single_inserts(self):
+        # First chunk fails as a whole; the second one goes through in bulk
+        execute = AsyncMock(side_effect=[APIError({"code": "22P02", "message": "bad row"}),
+                                         SimpleNamespace(data=[{}])])
+        insert = AsyncMock(side_effect=[True, Exception("bad row")])
+
+        with patch.object(ticket_sync, "execute_with_retry", execute), \
+                patch.object(ticket_sync, "insert_project_ticket", insert):
+            result = await ticket_sync.bulk_insert_project_tickets(tickets("A", "B", "C"), chunk_size=2)
+
+        self.assertEqual(result, (2, 1))
+        self.assertEqual([call.args[0].ticket_number for call in insert.await_args_list], ["A", "B"])
+
+    async def test_duplicate_ticket_numbers_are_sent_once(self):
+        execute = AsyncMock(return_value=SimpleNamespace(data=[{}]))
+        with patch.object(ticket_sync, "execute_with_retry", execute):
+            result = await ticket_sync.bulk_insert_project_tickets(tickets("A", "A"))
+
+        self.assertEqual(result, (1, 0))
+
+
+class FakeContinueClient:
+    """
+    Records continue-status queries; execute_with_retry is replaced by execute below.
+
+    rpc() returns ("rpc", records) and a per-company update returns
+    ("update", company_id, ticket_numbers), so results don't depend on call order.
+    """
+
+    def __init__(self, rpc_available=True, updated_rows=()):
+        self.rpc_available = rpc_available
+        self.updated_rows = set(updated_rows)
+
+    def rpc(self, name, params):
+        return ("rpc", params["records"])
+
+    def table(self, name):
+        return FakeUpdate()
+
+    async def execute(self, query):
+        if query[0] == "rpc":
+            if not self.rpc_available:
+                raise APIError({"code": ticket_sync.UNDEFINED_FUNCTION_CODE, "message": "Could not find the function"})
+            rows = [(r["ticket_number"], r["company_id"]) for r in query[1]]
+        else:
+            rows = [(number, query[1]) for number in query[2]]
+        return SimpleNamespace(data=[{"ticket_number": number, "company_id": company_id}
+                                     for number, company_id in rows if (number, company_id) in self.updated_rows])
+
+
+class FakeUpdate:
+    def update(self, values):
+        return self
+
+    def in_(self, column, values):
+        self.numbers = tuple(values)
+        return self
+
+    def eq(self, column, value):
+        return ("update", value, self.numbers)
+
+
+class ContinueStatusTest(unittest.IsolatedAsyncioTestCase):
+
+    async def run_update(self, client, pairs):
+        with patch.object(ticket_sync, "get_service_client", lambda: client), \
+                patch.object(ticket_sync, "execute_with_retry", client.execute):
+            return await ticket_sync.update_old_tickets_continue_status(pairs)
+
+    async def test_bulk_update_uses_the_database_function(self):
+        client = FakeContinueClient(updated_rows=[("A", 1)])
+
+        results = await self.run_update(client, [("A", 1), ("B", 1)])
+
+        self.assertEqual(results, {("A", 1): True, ("B", 1): False})
+
+    async def test_results_are_keyed_by_ticket_and_company(self):
+        # The same number under two companies: only company 1's row exists
+        client = FakeContinueClient(updated_rows=[("A", 1)])
+
+        results = await self.run_update(client, [("A", 1), ("A", 2)])
+
+        self.assertEqual(results, {("A", 1): True, ("A", 2): False})
+
+    async def test_missing_function_falls_back_to_one_update_per_company(self):
+        client = FakeContinueClient(rpc_available=False, updated_rows=[("A", 1), ("C", 2)])
+
+        results = await self.run_update(client, [("A", 1), ("A", 2), ("B", 2), ("C", 2)])
+
+        self.assertEqual(results, {("A", 1): True, ("A", 2): False, ("B", 2): False, ("C", 2): True})
+
+    async def test_single_update_reports_failure_without_raising(self):
+        execute = AsyncMock(side_effect=APIError({"code": "23514", "message": "check violation"}))
+        with patch.object(ticket_sync, "get_service_client", MagicMock()), \
+                patch.object(ticket_sync, "execute_with_retry", execute):
+            self.assertFalse(await ticket_sync.update_old_ticket_continue_status("A", 1))
+
+    async def test_single_update_delegates_to_the_bulk_update(self):
+        client = FakeContinueClient(updated_rows=[("A", 1)])
+        with patch.object(ticket_sync, "get_service_client", lambda: client), \
+                patch.object(ticket_sync, "execute_with_retry", client.execute):
+            self.assertTrue(await ticket_sync.update_old_ticket_continue_status("A", 1))
+            self.assertFalse(await ticket_sync.update_old_ticket_continue_status("A", 2))
+
+
+class UpdateProjectTicketTest(unittest.IsolatedAsyncioTestCase):
+
+    async def run_update(self, data):
+        client = MagicMock()
+        execute = AsyncMock(return_value=SimpleNamespace(data=data, count=0))
+        with patch.object(ticket_sync, "get_service_client", lambda: client), \
+                patch.object(ticket_sync, "execute_async", execute):
+            updated = await ticket_sync.update_project_ticket(MagicMock(ticket_number="A"))
+        return updated, client.table.return_value.update
+
+    async def test_updated_row_is_reported(self):
+        # The updated rows are asked for (no returning="minimal", whose empty
+        # body postgrest reports as count=0)
+        updated, update = await self.run_update([{"ticket_number": "A"}])
+
+        self.assertTrue(updated)
+        self.assertEqual(update.call_args.kwargs, {})
+
+    async def test_no_matching_row_is_reported(self):
+        updated, _ = await self.run_update([])
+
+        self.assertFalse(updated)
+
+
+class TicketExistsTest(unittest.IsolatedAsyncioTestCase):
+
+    async def check(self, data):
+        # count stays 0 like the body-less HEAD response postgrest mis-parses
+        execute = AsyncMock(return_value=SimpleNamespace(data=data, count=0))
+        with patch.object(ticket_sync, "get_service_client", MagicMock()), \
+                patch.object(ticket_sync, "execute_async", execute):
+            return await ticket_sync.ticket_exists(" A ")
+
+    async def test_existing_ticket(self):
+        self.assertTrue(await self.check([{"id": 1}]))
+
+    async def test_missing_ticket(self):
+        self.assertFalse(await self.check([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the assigned-user queries behind the weekly digest.
+
+This script tests:
+1. get_unique_assigned_users pages through unique_assigned_users until a short page
+2. Every page's users are returned, in order
+
+No database is needed: the Supabase calls are replaced with mocks.
+
+Usage:
+    python test_user_management.py
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tasks import user_management
+
+
+def users(start, count):
+    return [{"email": f"user{n}@example.com", "name": f"User {n}"} for n in range(start, start + count)]
+
+
+class UniqueAssignedUsersTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_pages_until_a_short_page(self):
+        client = MagicMock()
+        execute = AsyncMock(side_effect=[SimpleNamespace(data=users(0, 2)),
+                                         SimpleNamespace(data=users(2, 2)),
+                                         SimpleNamespace(data=users(4, 1))])
+
+        with patch.object(user_management, "UNIQUE_USERS_PAGE_SIZE", 2), \
+                patch.object(user_management, "get_service_client", lambda: client), \
+                patch.object(user_management, "execute_async", execute):
+            result = await user_management.get_unique_assigned_users()
+
+        self.assertEqual(result, users(0, 5))
+        ranges = [call.args for call in client.rpc.return_value.range.call_args_list]
+        self.assertEqual(ranges, [(0, 1), (2, 3), (4, 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
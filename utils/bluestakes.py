@@ -3,17 +3,41 @@ BlueStakes API utility functions.
 Shared functions for interacting with the BlueStakes API to avoid circular imports.
 """
 import httpx
+import json
 import logging
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
 from fastapi import HTTPException
 from pydantic import BaseModel
+from utils.bluestakes_token_manager import get_token_for_company, get_or_refresh_token, clear_token
+from utils.http_client import get_http_client
+from utils.rate_limit import AIMDLimiter, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
 # BlueStakes API configuration
 BLUESTAKES_BASE_URL = "https://newtin-api.bluestakes.org/api"
 
+# Requests in flight to BlueStakes adapt between these bounds: halved on a 429/5xx,
+# raised by one after every BLUESTAKES_INCREASE_EVERY successful responses
+BLUESTAKES_MIN_CONCURRENCY = 1
+BLUESTAKES_MAX_CONCURRENCY = 32
+BLUESTAKES_INCREASE_EVERY = 20
+
+# Attempts per request when BlueStakes answers 429 Too Many Requests
+BLUESTAKES_THROTTLE_ATTEMPTS = 3
+
+# Shared by every BlueStakes request in the process
+bluestakes_limiter = AIMDLimiter(
+    initial=16,
+    minimum=BLUESTAKES_MIN_CONCURRENCY,
+    maximum=BLUESTAKES_MAX_CONCURRENCY,
+    increase_every=BLUESTAKES_INCREASE_EVERY
+)
+
+# GeoJSON types accepted for the work_area column
+VALID_GEOJSON_TYPES = frozenset({"Feature", "FeatureCollection", "Polygon", "MultiPolygon"})
+
 
 class ProjectTicketCreate(BaseModel):
     project_id: Optional[int] = None
@@ -64,6 +88,48 @@ class ProjectTicketCreate(BaseModel):
     responses: Optional[List[Any]] = None
 
 
+async def bluestakes_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request to BlueStakes through the shared client and adaptive limiter.
+
+    429 responses are retried up to BLUESTAKES_THROTTLE_ATTEMPTS times, after the
+    server's Retry-After (or an exponential pause when it gives none); the caller
+    handles every other status.
+
+    Args:
+        method: HTTP method
+        url: Full URL to request
+        **kwargs: Passed through to httpx
+
+    Returns:
+        The httpx.Response
+    """
+    for attempt in range(BLUESTAKES_THROTTLE_ATTEMPTS):
+        ticket = await bluestakes_limiter.acquire()
+        response = None
+        throttled = False
+        retry_after = None
+        try:
+            response = await get_http_client().request(method, url, **kwargs)
+            throttled = response.status_code == 429 or response.status_code >= 500
+            retry_after = parse_retry_after(response)
+            if response.status_code == 429 and retry_after is None:
+                retry_after = 2 ** attempt
+        except httpx.TransportError:
+            # Timeouts, refused or reset connections: all signs of an overloaded server
+            throttled = True
+            raise
+        finally:
+            await bluestakes_limiter.release(ticket, throttled, retry_after,
+                                             completed=response is not None)
+
+        if response.status_code != 429 or attempt == BLUESTAKES_THROTTLE_ATTEMPTS - 1:
+            return response
+        logger.warning(f"BlueStakes rate limited {url} (attempt {attempt + 1}/{BLUESTAKES_THROTTLE_ATTEMPTS})")
+
+    return response
+
+
 async def get_bluestakes_auth_token(username: str, password: str, company_id: Optional[int] = None) -> str:
     """
     Get authentication token from BlueStakes API with caching support.
@@ -78,7 +144,6 @@ async def get_bluestakes_auth_token(username: str, password: str, company_id: Op
     """
     # If company_id is provided, use token caching
     if company_id:
-        from utils.bluestakes_token_manager import get_or_refresh_token
         return await get_or_refresh_token(company_id, username, password)
     
     # Otherwise, authenticate directly (legacy behavior)
@@ -101,28 +166,29 @@ async def get_bluestakes_auth_token_raw(username: str, password: str) -> str:
     }
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{BLUESTAKES_BASE_URL}/login-json",
-                json=auth_data,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # BlueStakes returns token in "Authorization" field as "Bearer [token]"
-            if "Authorization" in data:
-                auth_header = data["Authorization"]
-                if auth_header.startswith("Bearer "):
-                    return auth_header.split(" ", 1)[1]
-                else:
-                    return auth_header
+        response = await bluestakes_request(
+            "POST",
+            f"{BLUESTAKES_BASE_URL}/login-json",
+            json=auth_data,
+            headers={"Content-Type": "application/json"},
+            timeout=30.0
+        )
+        response.raise_for_status()
+        
+        data = response.json()
+        
+        # BlueStakes returns token in "Authorization" field as "Bearer [token]"
+        if "Authorization" in data:
+            auth_header = data["Authorization"]
+            if auth_header.startswith("Bearer "):
+                return auth_header.split(" ", 1)[1]
             else:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Authentication failed: No token received from BlueStakes API"
-                )
+                return auth_header
+        else:
+            raise HTTPException(
+                status_code=401,
+                detail="Authentication failed: No token received from BlueStakes API"
+            )
                 
     except httpx.TimeoutException:
         raise HTTPException(
@@ -201,16 +267,16 @@ async def get_ticket_details(token: str, ticket_number: str) -> Dict[str, Any]:
             "Content-Type": "application/json"
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(
-                f"{BLUESTAKES_BASE_URL}/tickets/{ticket_number}",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "accept": "application/json"
-                }
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await bluestakes_request(
+            "GET",
+            f"{BLUESTAKES_BASE_URL}/tickets/{ticket_number}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "accept": "application/json"
+            }
+        )
+        response.raise_for_status()
+        return response.json()
             
     except httpx.TimeoutException:
         raise HTTPException(
@@ -255,13 +321,13 @@ async def get_ticket_secondary_functions(token: str, ticket_number: str) -> Dict
             "Content-Type": "application/json"
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(
-                f"{BLUESTAKES_BASE_URL}/tickets/{ticket_number}/secondary-functions",
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await bluestakes_request(
+            "GET",
+            f"{BLUESTAKES_BASE_URL}/tickets/{ticket_number}/secondary-functions",
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
             
     except httpx.TimeoutException:
         raise HTTPException(
@@ -295,17 +361,45 @@ def parse_bluestakes_datetime(date_str: Optional[str]) -> Optional[datetime]:
         return None
     
     try:
-        # Handle ISO format with timezone
-        if date_str.endswith('Z'):
-            date_str = date_str[:-1] + '+00:00'
+        # fromisoformat (Python 3.11+) accepts a trailing 'Z' and any number of fractional digits
         return datetime.fromisoformat(date_str)
-    except Exception:
-        try:
-            # Try common date formats
-            return datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-        except Exception:
-            logger.warning(f"Could not parse datetime: {date_str}")
-            return None
+    except (TypeError, ValueError):
+        logger.warning("Could not parse datetime: %s", date_str)
+        return None
+
+
+def format_street_location(ticket_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Build "<from>-<to> <street> at/between <cross streets>" from Bluestakes ticket data.
+
+    Shared by format_address_from_bluestakes_data and the digest's
+    format_location_from_bluestakes, which differ only in their placeholder text.
+
+    Returns:
+        The location string, or None if the ticket has no street
+    """
+    get = ticket_data.get
+    street = get("street")
+    if not street:
+        return None
+
+    # Handle street with from/to addresses
+    st_from_address, st_to_address = get("st_from_address"), get("st_to_address")
+    if st_from_address and st_to_address and st_from_address != "0" and st_to_address != "0":
+        if st_from_address == st_to_address:
+            location = f"{st_from_address} {street}"
+        else:
+            location = f"{st_from_address}-{st_to_address} {street}"
+    else:
+        location = street
+
+    # Add cross streets if available (blank placeholders like " " are skipped)
+    cross_streets = [cross for cross in (get("cross1"), get("cross2")) if cross and str(cross).strip()]
+    if len(cross_streets) == 1:
+        return f"{location} at {cross_streets[0]}"
+    if cross_streets:
+        return f"{location} between {cross_streets[0]} and {cross_streets[1]}"
+    return location
 
 
 def format_address_from_bluestakes_data(ticket_data: Dict[str, Any]) -> str:
@@ -328,78 +422,59 @@ def format_address_from_bluestakes_data(ticket_data: Dict[str, Any]) -> str:
         Formatted address string
     """
     try:
-        street = ticket_data.get("street")
-        st_from_address = ticket_data.get("st_from_address")
-        st_to_address = ticket_data.get("st_to_address")
-        cross1 = ticket_data.get("cross1")
-        cross2 = ticket_data.get("cross2")
-
-        if not street:
-            return "Address not available"
-
-        address_parts = []
-
-        # Handle street with from/to addresses
-        if st_from_address and st_to_address and st_from_address != "0" and st_to_address != "0":
-            if st_from_address == st_to_address:
-                address_parts.append(f"{st_from_address} {street}")
-            else:
-                address_parts.append(f"{st_from_address}-{st_to_address} {street}")
-        else:
-            address_parts.append(street)
-
-        # Add cross streets if available
-        cross_streets = []
-        if cross1 and cross1 != " ":
-            cross_streets.append(cross1)
-        if cross2 and cross2 != " ":
-            cross_streets.append(cross2)
-
-        if cross_streets:
-            if len(cross_streets) == 1:
-                address_parts.append(f"at {cross_streets[0]}")
-            else:
-                address_parts.append(f"between {cross_streets[0]} and {cross_streets[1]}")
-
-        return " ".join(address_parts)
+        return format_street_location(ticket_data) or "Address not available"
 
     except Exception as e:
         logger.warning(f"Error formatting address: {str(e)}")
         return "Address not available"
 
 
-def transform_bluestakes_ticket_to_project_ticket(ticket_data: Dict[str, Any], company_id: int = 1) -> ProjectTicketCreate:
+def _clean_string(value):
+    """Strip string values and convert empty strings to None."""
+    if isinstance(value, str):
+        cleaned = value.strip()
+        return cleaned or None
+    return value
+
+
+def transform_bluestakes_ticket_to_project_ticket(ticket_data: Dict[str, Any], company_id: int = 1,
+                                                  now: Optional[datetime] = None) -> ProjectTicketCreate:
     """
-    Transform BlueStakes ticket data to ProjectTicketCreate model with all fields
+    Transform BlueStakes ticket data to ProjectTicketCreate model with all fields.
+
+    Callers transforming a whole batch for one company can bind company_id and a
+    single batch timestamp once, e.g.
+    functools.partial(transform_bluestakes_ticket_to_project_ticket, company_id=company_id, now=batch_time),
+    so every ticket in the batch shares the same bluestakes_data_updated_at.
     """
+    get = ticket_data.get
+
     # Parse required dates
-    replace_by_date = parse_bluestakes_datetime(ticket_data.get("replace_by_date"))
-    legal_date = parse_bluestakes_datetime(ticket_data.get("legal_date"))
-    expires = parse_bluestakes_datetime(ticket_data.get("expires"))
-    original_date = parse_bluestakes_datetime(ticket_data.get("original_date"))
+    replace_by_date = parse_bluestakes_datetime(get("replace_by_date"))
+    legal_date = parse_bluestakes_datetime(get("legal_date"))
+    expires = parse_bluestakes_datetime(get("expires"))
+    original_date = parse_bluestakes_datetime(get("original_date"))
     
     # Determine if ticket should continue updates based on expiration
-    now = datetime.now(timezone.utc)
-    is_continue_update = True
-    
-    if expires and expires < now:
-        is_continue_update = False
+    # (the same timestamp is reused for bluestakes_data_updated_at below)
+    if now is None:
+        now = datetime.now(timezone.utc)
+    is_continue_update = not (expires and expires < now)
     
     # Handle work_area GeoJSON data
     work_area = None
-    if ticket_data.get("work_area"):
+    work_area_data = get("work_area")
+    if work_area_data:
         try:
             # Ensure work_area is valid GeoJSON
-            work_area_data = ticket_data.get("work_area")
             if isinstance(work_area_data, dict):
                 # Validate basic GeoJSON structure
-                if work_area_data.get("type") in ["Feature", "FeatureCollection", "Polygon", "MultiPolygon"]:
+                if work_area_data.get("type") in VALID_GEOJSON_TYPES:
                     work_area = work_area_data
                 else:
                     logger.warning(f"Invalid GeoJSON type in work_area: {work_area_data.get('type')}")
             elif isinstance(work_area_data, str):
                 # Try to parse JSON string
-                import json
                 try:
                     work_area = json.loads(work_area_data)
                 except json.JSONDecodeError:
@@ -407,26 +482,19 @@ def transform_bluestakes_ticket_to_project_ticket(ticket_data: Dict[str, Any], c
         except Exception as e:
             logger.warning(f"Error processing work_area data: {str(e)}")
     
-    # Helper function to clean string values (convert empty strings to None)
-    def clean_string(value):
-        if isinstance(value, str):
-            cleaned = value.strip()
-            return cleaned if cleaned and cleaned != "" else None
-        return value
-    
     return ProjectTicketCreate(
         project_id=None,
-        ticket_number=clean_string(ticket_data.get("ticket", "")) or "",
+        ticket_number=_clean_string(get("ticket", "")) or "",
         replace_by_date=replace_by_date,
-        old_ticket=clean_string(ticket_data.get("original_ticket")),
+        old_ticket=_clean_string(get("original_ticket")),
         is_continue_update=is_continue_update,
         legal_date=legal_date,
         company_id=company_id,
         
         # Location & Maps
-        place=clean_string(ticket_data.get("place")),
-        street=clean_string(ticket_data.get("street")),
-        location_description=clean_string(ticket_data.get("location")),
+        place=_clean_string(get("place")),
+        street=_clean_string(get("street")),
+        location_description=_clean_string(get("location")),
         formatted_address=format_address_from_bluestakes_data(ticket_data),
         work_area=work_area,
 
@@ -435,28 +503,28 @@ def transform_bluestakes_ticket_to_project_ticket(ticket_data: Dict[str, Any], c
         original_date=original_date,
 
         # Work Details
-        done_for=clean_string(ticket_data.get("done_for")),
-        type=clean_string(ticket_data.get("type")),
+        done_for=_clean_string(get("done_for")),
+        type=_clean_string(get("type")),
 
         # Address Details
-        st_from_address=clean_string(ticket_data.get("st_from_address")),
-        st_to_address=clean_string(ticket_data.get("st_to_address")),
-        cross1=clean_string(ticket_data.get("cross1")),
-        cross2=clean_string(ticket_data.get("cross2")),
-        county=clean_string(ticket_data.get("county")),
-        state=clean_string(ticket_data.get("state")),
-        zip=clean_string(ticket_data.get("zip")),
+        st_from_address=_clean_string(get("st_from_address")),
+        st_to_address=_clean_string(get("st_to_address")),
+        cross1=_clean_string(get("cross1")),
+        cross2=_clean_string(get("cross2")),
+        county=_clean_string(get("county")),
+        state=_clean_string(get("state")),
+        zip=_clean_string(get("zip")),
 
         # Contact Information
-        name=clean_string(ticket_data.get("contact")),
-        phone=clean_string(ticket_data.get("contact_phone")),
-        email=clean_string(ticket_data.get("email")),
+        name=_clean_string(get("contact")),
+        phone=_clean_string(get("contact_phone")),
+        email=_clean_string(get("email")),
         
         # Ticket Management
-        revision=clean_string(ticket_data.get("revision")),
+        revision=_clean_string(get("revision")),
         
         # Metadata
-        bluestakes_data_updated_at=datetime.now(timezone.utc),
+        bluestakes_data_updated_at=now,
         bluestakes_data=ticket_data  # Store full raw response as backup
     )
 
@@ -507,8 +575,6 @@ async def make_authenticated_request(
     Raises:
         HTTPException: If request fails after retry
     """
-    from utils.bluestakes_token_manager import get_token_for_company, clear_token
-
     # Get token (cached or fresh) - automatically fetches credentials
     token = await get_token_for_company(company_id)
 
@@ -521,10 +587,9 @@ async def make_authenticated_request(
     kwargs["headers"] = headers
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await getattr(client, method.lower())(url, **kwargs)
-            response.raise_for_status()
-            return response.json()
+        response = await bluestakes_request(method, url, **kwargs)
+        response.raise_for_status()
+        return response.json()
 
     except httpx.HTTPStatusError as e:
         # If we get 401/403, token might be expired - try once more with fresh token
@@ -541,10 +606,9 @@ async def make_authenticated_request(
 
             # Retry the request
             try:
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    response = await getattr(client, method.lower())(url, **kwargs)
-                    response.raise_for_status()
-                    return response.json()
+                response = await bluestakes_request(method, url, **kwargs)
+                response.raise_for_status()
+                return response.json()
             except Exception as retry_e:
                 logger.error(f"Request failed even after token refresh: {str(retry_e)}")
                 raise HTTPException(
@@ -4,10 +4,11 @@ Bluestakes Token Management System
 Handles caching and automatic refresh of Bluestakes API authentication tokens
 to reduce redundant login calls and respect API rate limits.
 """
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any
-from config.supabase_client import get_service_client
+from typing import Optional, Dict, Any, Tuple
+from config.supabase_client import get_service_client, execute_async
 from fastapi import HTTPException
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,16 @@ logger = logging.getLogger(__name__)
 # Default token TTL (1 hour)
 DEFAULT_TOKEN_TTL_HOURS = 1
 
+# Tokens are treated as expired this long before their actual expiry
+TOKEN_EXPIRY_BUFFER = timedelta(minutes=5)
+
+# In-process copy of the tokens stored on the companies table, keyed by company_id.
+# Saves a database round trip on every authenticated BlueStakes request.
+_memory_tokens: Dict[int, Tuple[str, datetime]] = {}
+
+# One lock per company so concurrent callers that miss the cache share a single login
+_refresh_locks: Dict[int, asyncio.Lock] = {}
+
 
 async def get_token_for_company(company_id: int) -> str:
     """
@@ -34,47 +45,52 @@ async def get_token_for_company(company_id: int) -> str:
         # First, check if we have a valid cached token
         cached_token = await get_cached_token(company_id)
         if cached_token:
-            logger.info(f"Using cached token for company {company_id}")
+            logger.debug("Using cached token for company %s", company_id)
             return cached_token
 
-        # No valid cached token, fetch credentials and authenticate
-        logger.info(f"No valid cached token for company {company_id}, fetching credentials...")
-
-        # Get company credentials from database
-        result = (get_service_client()
-                 .schema("public")
-                 .table("companies")
-                 .select("bluestakes_username, bluestakes_password")
-                 .eq("id", company_id)
-                 .execute())
-
-        if not result.data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Company {company_id} not found"
-            )
-
-        company_data = result.data[0]
-        username = company_data.get("bluestakes_username")
-        encrypted_password = company_data.get("bluestakes_password")
-
-        if not username or not encrypted_password:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Company {company_id} has no Bluestakes credentials configured"
-            )
-
-        # Decrypt password
-        from utils.encryption import safe_decrypt_password
-        password = safe_decrypt_password(encrypted_password)
-
-        # Authenticate and store new token
-        from utils.bluestakes import get_bluestakes_auth_token_raw
-        new_token = await get_bluestakes_auth_token_raw(username, password)
-        await store_token(company_id, new_token)
-
-        logger.info(f"Successfully authenticated and cached new token for company {company_id}")
-        return new_token
+        async with _refresh_locks.setdefault(company_id, asyncio.Lock()):
+            # Another caller may have logged in while we waited for the lock
+            cached_token = await get_cached_token(company_id)
+            if cached_token:
+                return cached_token
+
+            # No valid cached token, fetch credentials and authenticate
+            logger.info(f"No valid cached token for company {company_id}, fetching credentials...")
+
+            # Get company credentials from database
+            result = await execute_async(get_service_client()
+                                         .schema("public")
+                                         .table("companies")
+                                         .select("bluestakes_username, bluestakes_password")
+                                         .eq("id", company_id))
+
+            if not result.data:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Company {company_id} not found"
+                )
+
+            company_data = result.data[0]
+            username = company_data.get("bluestakes_username")
+            encrypted_password = company_data.get("bluestakes_password")
+
+            if not username or not encrypted_password:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Company {company_id} has no Bluestakes credentials configured"
+                )
+
+            # Decrypt password
+            from utils.encryption import safe_decrypt_password
+            password = safe_decrypt_password(encrypted_password)
+
+            # Authenticate and store new token
+            from utils.bluestakes import get_bluestakes_auth_token_raw
+            new_token = await get_bluestakes_auth_token_raw(username, password)
+            await store_token(company_id, new_token)
+
+            logger.info(f"Successfully authenticated and cached new token for company {company_id}")
+            return new_token
 
     except Exception as e:
         logger.error(f"Error getting token for company {company_id}: {str(e)}")
@@ -102,18 +118,23 @@ async def get_or_refresh_token(company_id: int, username: str, password: str) ->
         # First, check if we have a valid cached token
         cached_token = await get_cached_token(company_id)
         if cached_token:
-            logger.info(f"Using cached token for company {company_id}")
+            logger.debug("Using cached token for company %s", company_id)
             return cached_token
 
-        # No valid cached token, authenticate and store new token
-        logger.info(f"No valid cached token for company {company_id}, authenticating...")
-        from utils.bluestakes import get_bluestakes_auth_token_raw
+        async with _refresh_locks.setdefault(company_id, asyncio.Lock()):
+            cached_token = await get_cached_token(company_id)
+            if cached_token:
+                return cached_token
+
+            # No valid cached token, authenticate and store new token
+            logger.info(f"No valid cached token for company {company_id}, authenticating...")
+            from utils.bluestakes import get_bluestakes_auth_token_raw
 
-        new_token = await get_bluestakes_auth_token_raw(username, password)
-        await store_token(company_id, new_token)
+            new_token = await get_bluestakes_auth_token_raw(username, password)
+            await store_token(company_id, new_token)
 
-        logger.info(f"Successfully authenticated and cached new token for company {company_id}")
-        return new_token
+            logger.info(f"Successfully authenticated and cached new token for company {company_id}")
+            return new_token
 
     except Exception as e:
         logger.error(f"Error getting token for company {company_id}: {str(e)}")
@@ -130,13 +151,21 @@ async def get_cached_token(company_id: int) -> Optional[str]:
     Returns:
         Valid token or None if no valid token exists
     """
+    current_time = datetime.now(timezone.utc)
+
+    memory_token = _memory_tokens.get(company_id)
+    if memory_token:
+        token, expires_at = memory_token
+        if current_time + TOKEN_EXPIRY_BUFFER < expires_at:
+            return token
+        _memory_tokens.pop(company_id, None)
+
     try:
-        result = (get_service_client()
-                 .schema("public")
-                 .table("companies")
-                 .select("bluestakes_token, bluestakes_token_expires_at")
-                 .eq("id", company_id)
-                 .execute())
+        result = await execute_async(get_service_client()
+                                     .schema("public")
+                                     .table("companies")
+                                     .select("bluestakes_token, bluestakes_token_expires_at")
+                                     .eq("id", company_id))
         
         if not result.data:
             return None
@@ -149,12 +178,11 @@ async def get_cached_token(company_id: int) -> Optional[str]:
             return None
             
         # Parse expiration time
-        expires_at = datetime.fromisoformat(expires_at_str.replace('Z', '+00:00'))
-        current_time = datetime.now(timezone.utc)
+        expires_at = datetime.fromisoformat(expires_at_str)
         
         # Check if token is still valid (with 5 minute buffer)
-        buffer_time = timedelta(minutes=5)
-        if current_time + buffer_time < expires_at:
+        if current_time + TOKEN_EXPIRY_BUFFER < expires_at:
+            _memory_tokens[company_id] = (token, expires_at)
             return token
         else:
             logger.info(f"Cached token for company {company_id} has expired")
@@ -180,16 +208,16 @@ async def store_token(company_id: int, token: str, ttl_hours: int = DEFAULT_TOKE
     """
     try:
         expires_at = datetime.now(timezone.utc) + timedelta(hours=ttl_hours)
+        _memory_tokens[company_id] = (token, expires_at)
         
-        result = (get_service_client()
-                 .schema("public")
-                 .table("companies")
-                 .update({
-                     "bluestakes_token": token,
-                     "bluestakes_token_expires_at": expires_at.isoformat()
-                 })
-                 .eq("id", company_id)
-                 .execute())
+        result = await execute_async(get_service_client()
+                                     .schema("public")
+                                     .table("companies")
+                                     .update({
+                                         "bluestakes_token": token,
+                                         "bluestakes_token_expires_at": expires_at.isoformat()
+                                     })
+                                     .eq("id", company_id))
         
         success = bool(result.data)
         if success:
@@ -228,6 +256,8 @@ async def clear_token(company_id: int) -> bool:
     Returns:
         True if successful, False otherwise
     """
+    _memory_tokens.pop(company_id, None)
+
     try:
         result = (get_service_client()
                  .schema("public")
@@ -275,6 +305,8 @@ async def cleanup_expired_tokens() -> int:
             return 0
             
         expired_company_ids = [row["id"] for row in result.data]
+        for expired_company_id in expired_company_ids:
+            _memory_tokens.pop(expired_company_id, None)
         
         # Clear expired tokens
         clear_result = (get_service_client()
@@ -331,7 +363,7 @@ async def get_token_stats() -> Dict[str, Any]:
         for row in result.data:
             expires_at_str = row.get("bluestakes_token_expires_at")
             if expires_at_str:
-                expires_at = datetime.fromisoformat(expires_at_str.replace('Z', '+00:00'))
+                expires_at = datetime.fromisoformat(expires_at_str)
                 
                 if current_time >= expires_at:
                     expired_tokens += 1
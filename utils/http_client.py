@@ -0,0 +1,58 @@
+"""
+Shared HTTP client for outbound API calls.
+
+A single httpx.AsyncClient is created lazily and reused for every BlueStakes
+request and outgoing email so connections (and their TLS sessions)
+are kept alive across calls instead of being re-established per request.
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional "h2" package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool limits for the shared client
+MAX_KEEPALIVE_CONNECTIONS = 32
+MAX_CONNECTIONS = 64
+
+# Default request timeout in seconds (individual calls may override it)
+DEFAULT_TIMEOUT = 60.0
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared httpx.AsyncClient, creating it on first use.
+
+    Returns:
+        The process-wide AsyncClient
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=MAX_CONNECTIONS
+            )
+        )
+        logger.info(f"Created shared HTTP client (http2={HTTP2_AVAILABLE})")
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections (call on shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
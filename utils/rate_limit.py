@@ -0,0 +1,119 @@
+"""
+Adaptive concurrency limiting for outbound API calls.
+
+AIMDLimiter caps how many requests are in flight and adjusts that cap from the
+responses it sees: the cap halves on a throttled response (429/5xx or a
+transport error) and grows by one after every run of successful responses
+(additive increase, multiplicative decrease). Requests that were already in
+flight when the cap was lowered cannot lower it again, so a burst of
+concurrent 429s halves it once. A Retry-After header pauses new requests
+until the server is ready again.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limiter whose limit follows additive-increase / multiplicative-decrease.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, increase_every: int):
+        """
+        Args:
+            initial: Starting number of requests allowed in flight
+            minimum: Lowest the limit may drop to
+            maximum: Highest the limit may grow to
+            increase_every: Successful responses needed before the limit grows by one
+        """
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_every = increase_every
+        self._in_flight = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        # Bumped on every decrease; a request may only lower the limit if none
+        # happened since it started
+        self._generation = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> int:
+        """
+        Wait for any Retry-After pause to end, then for a free slot.
+
+        The slot is only taken once nothing is left to wait for, so a caller
+        cancelled while waiting never holds one.
+
+        Returns:
+            Ticket to pass back to release()
+        """
+        while True:
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            async with self._condition:
+                while self._in_flight >= self.limit:
+                    await self._condition.wait()
+                # Another request may have set a new Retry-After while we waited
+                if self._resume_at <= time.monotonic():
+                    self._in_flight += 1
+                    return self._generation
+
+    async def release(self, ticket: int, throttled: bool, retry_after: Optional[float] = None,
+                      completed: bool = True) -> None:
+        """
+        Free a slot and adjust the limit from the request's outcome.
+
+        Args:
+            ticket: Value returned by the matching acquire()
+            throttled: True if the server signalled overload (429, 5xx, transport error)
+            retry_after: Seconds the server asked us to wait, if it said
+            completed: False if the request ended some other way (e.g. it was
+                cancelled); the slot is freed without counting a success
+        """
+        async with self._condition:
+            self._in_flight -= 1
+
+            if throttled:
+                if retry_after:
+                    self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+                # Only the first throttle seen by requests sent under the current
+                # limit lowers it; the rest report the same overload
+                if ticket == self._generation:
+                    new_limit = max(self.minimum, self.limit // 2)
+                    if new_limit != self.limit:
+                        logger.warning(f"Throttled by upstream API, lowering concurrency {self.limit} -> {new_limit}")
+                    self.limit = new_limit
+                    self._generation += 1
+                self._successes = 0
+            elif completed:
+                self._successes += 1
+                if self._successes >= self.increase_every and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+
+            self._condition.notify_all()
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Read a Retry-After header given in seconds.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or not a number
+    """
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None